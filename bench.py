@@ -0,0 +1,227 @@
+import argparse
+import atexit
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+WORDS = [
+    'отчёт', 'встреча', 'купить', 'позвонить', 'проект', 'бюджет', 'молоко', 'хлеб', 'договор', 'квартира',
+    'ремонт', 'отпуск', 'билеты', 'врач', 'школа', 'подарок', 'машина', 'налог', 'счёт', 'работа',
+    'семья', 'дача', 'книга', 'фильм', 'спорт', 'ёлка', 'праздник', 'письмо', 'заказ', 'доставка'
+]
+FIRST_NAMES = ['Иван', 'Мария', 'Пётр', 'Анна', 'Сергей', 'Ольга', 'Алексей', 'Елена', 'Дмитрий', 'Наталья']
+LAST_NAMES = ['Иванов', 'Петрова', 'Сидоров', 'Смирнова', 'Кузнецов', 'Попова', 'Соколов', 'Лебедева', 'Козлов', 'Новикова']
+CATEGORIES = ['Продукты', 'Транспорт', 'Зарплата', 'Кафе', 'Коммунальные услуги', 'Здоровье', 'Одежда', 'Развлечения']
+PRIORITIES = ['Высокий', 'Средний', 'Низкий']
+
+def text(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+def day(rng, year=2025):
+    return f'{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+
+def generate(pa, kind, count, seed):
+    rng = random.Random(f'{seed}-{kind}')
+    for record_id in range(1, count + 1):
+        if kind == 'notes':
+            yield pa.Note(record_id, text(rng, 3).capitalize(), text(rng, rng.randint(10, 60)), day(rng) + ' 10:00:00')
+        elif kind == 'tasks':
+            yield pa.Task(record_id, text(rng, 3).capitalize(), text(rng, 8), rng.random() < 0.3, rng.choice(PRIORITIES), day(rng, rng.choice([2024, 2025, 2026])))
+        elif kind == 'contacts':
+            name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {record_id}'
+            yield pa.Contact(record_id, name, f'+7 9{rng.randint(10, 99)} {rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(10, 99)}', f'user{record_id}@example.com')
+        else:
+            amount = round(rng.uniform(1000, 90000), 2) if rng.random() < 0.1 else -round(rng.uniform(50, 5000), 2)
+            yield pa.FinanceRecord(record_id, amount, rng.choice(CATEGORIES), day(rng, rng.choice([2023, 2024, 2025])), text(rng, 4))
+
+def populate(pa, size, seed):
+    for kind, repository in repositories(pa).items():
+        batch = []
+        for record in generate(pa, kind, size, seed):
+            batch.append(record)
+            if len(batch) >= pa.IMPORT_BATCH_SIZE:
+                repository.add_many(batch)
+                batch = []
+        repository.add_many(batch)
+
+def repositories(pa):
+    return {'notes': pa.NOTES, 'tasks': pa.TASKS, 'contacts': pa.CONTACTS, 'finance': pa.FINANCE}
+
+def fresh_repository(pa, kind, directory=''):
+    if kind == 'notes':
+        return pa.NotesRepository(pa.make_storage(pa.NOTES_FILE, directory))
+    if kind == 'tasks':
+        return pa.TasksRepository(pa.make_storage(pa.TASKS_FILE, directory))
+    if kind == 'contacts':
+        return pa.ContactsRepository(pa.make_storage(pa.CONTACTS_FILE, directory))
+    return pa.FinanceRepository(pa.make_storage(pa.FINANCE_FILE, directory))
+
+def export_csv(pa, kind):
+    pa.export_records(repositories(pa)[kind], EXPORT_FIELDS[kind], [], f'bench_{kind}.csv')
+
+def import_fresh(pa, kind, from_row):
+    directory = tempfile.mkdtemp(prefix=f'import-{kind}-', dir='.')
+    pa.import_csv(fresh_repository(pa, kind, directory), from_row, f'bench_{kind}.csv')
+
+EXPORT_FIELDS = {
+    'notes': ['id', 'title', 'content', 'timestamp'],
+    'tasks': ['id', 'title', 'description', 'done', 'priority', 'due_date'],
+    'contacts': ['id', 'name', 'phone', 'email'],
+    'finance': ['id', 'amount', 'category', 'date', 'description'],
+}
+
+def operations(pa, size, seed):
+    rng = random.Random(seed)
+    ops = []
+    for kind in ('notes', 'tasks', 'contacts', 'finance'):
+        ops.append((f'load_{kind}', size, 1, lambda kind=kind: fresh_repository(pa, kind).refresh()))
+        ops.append((f'save_{kind}', size, 1, lambda kind=kind: repositories(pa)[kind].replace_all(repositories(pa)[kind].all())))
+        ops.append((f'export_{kind}', size, 1, lambda kind=kind: export_csv(pa, kind)))
+    importers = {'notes': pa.note_from_row, 'tasks': pa.task_from_row, 'contacts': pa.contact_from_row, 'finance': pa.finance_record_from_row}
+    for kind, from_row in importers.items():
+        ops.append((f'import_{kind}', size, 1, lambda kind=kind, from_row=from_row: import_fresh(pa, kind, from_row)))
+
+    def filter_tasks():
+        start = pa.date_key(day(rng))
+        list(pa.TASKS.query(
+            done=rng.choice([None, False]),
+            priority=rng.choice([None] + PRIORITIES),
+            due_from=start,
+            due_to=start + rng.randint(7, 90),
+            text=rng.choice(['', rng.choice(WORDS)]),
+            order_by=rng.choice([[], ['due'], ['-priority', 'title']]),
+            limit=20
+        ))
+
+    def finance_report():
+        start = pa.date_key(day(rng, rng.choice([2023, 2024, 2025])))
+        pa.FINANCE.period_totals(start, start + rng.randint(30, 365))
+        pa.FINANCE.category_report(start, start + rng.randint(30, 365))
+
+    ops.append(('filter_tasks', 1, 50, filter_tasks))
+    ops.append(('search_contact', 1, 50, lambda: pa.CONTACTS.search(rng.choice([rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)[:4], f'9{rng.randint(10, 99)}']))))
+    ops.append(('search_notes', 1, 50, lambda: pa.NOTES.search(rng.choice(WORDS)[:rng.randint(3, 6)])))
+    ops.append(('finance_report', 1, 50, finance_report))
+    return ops
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def measure(name, records, runs, operation, repeat):
+    tracemalloc.start()
+    operation()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    timings = []
+    for _ in range(runs * repeat):
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+    median = percentile(timings, 0.5)
+    return {
+        'runs': len(timings),
+        'p50_ms': median * 1000,
+        'p95_ms': percentile(timings, 0.95) * 1000,
+        'p99_ms': percentile(timings, 0.99) * 1000,
+        'max_ms': max(timings) * 1000,
+        'throughput': records / median if median else 0,
+        'peak_mb': peak / 1024 / 1024,
+    }
+
+def benchmark(pa, size, seed, repeat, only):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        populate(pa, size, seed)
+        for kind in repositories(pa):
+            export_csv(pa, kind)
+    print(f"Сгенерировано по {size} записей каждого типа за {time.perf_counter() - start:.1f} с")
+    results = {}
+    for name, records, runs, operation in operations(pa, size, seed):
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = measure(name, records, runs, operation, repeat)
+        results[name] = result
+        print(f"{name:16} p50 {result['p50_ms']:9.2f} мс  p95 {result['p95_ms']:9.2f} мс  p99 {result['p99_ms']:9.2f} мс  "
+              f"{result['throughput']:12.0f} {'зап/с' if records > 1 else 'оп/с '}  пик {result['peak_mb']:8.1f} МБ")
+    return results
+
+def run(size, backend, seed, repeat, only, keep):
+    directory = tempfile.mkdtemp(prefix='pa-bench-')
+    previous = os.getcwd()
+    os.chdir(directory)
+    os.environ['PA_STORAGE'] = backend
+    sys.modules.pop('personal_assistant', None)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    try:
+        import personal_assistant as pa
+        try:
+            return benchmark(pa, size, seed, repeat, only)
+        finally:
+            for repository in repositories(pa).values():
+                atexit.unregister(repository.persist_indexes)
+            if pa.sqlite_db is not None:
+                pa.sqlite_db.close()
+            for connection in pa.sqlite_databases.values():
+                connection.close()
+    finally:
+        sys.path.pop(0)
+        os.chdir(previous)
+        if keep:
+            print(f"Данные сохранены в {directory}")
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        ratio = result['p50_ms'] / baseline[key]['p50_ms'] if baseline[key]['p50_ms'] else 1
+        marker = ''
+        if ratio > 1 + threshold:
+            regressions.append(key)
+            marker = '  РЕГРЕССИЯ'
+        print(f"{key:28} {baseline[key]['p50_ms']:9.2f} -> {result['p50_ms']:9.2f} мс ({ratio:5.2f}x){marker}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочные тесты персонального помощника")
+    parser.add_argument('--size', type=int, nargs='+', default=[1000], help="количество записей каждого типа (можно несколько)")
+    parser.add_argument('--backend', choices=['journal', 'json', 'sqlite'], default='journal')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3, help="повторов каждой операции")
+    parser.add_argument('--only', nargs='*', default=[], help="префиксы операций, например load_ filter_tasks")
+    parser.add_argument('--keep', action='store_true', help="не удалять сгенерированные данные")
+    parser.add_argument('--save', help="сохранить результаты в JSON")
+    parser.add_argument('--compare', help="сравнить с ранее сохранёнными результатами")
+    parser.add_argument('--threshold', type=float, default=0.2, help="допустимое замедление p50 при сравнении")
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.size:
+        print(f"\n== {args.backend}, {size} записей ==")
+        for name, result in run(size, args.backend, args.seed, args.repeat, args.only, args.keep).items():
+            results[f'{args.backend}/{size}/{name}'] = result
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=4)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        print("\nСравнение с базовым запуском (p50):")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nОбнаружено регрессий: {len(regressions)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -1,45 +1,228 @@
 import json
+import argparse
+import ast
+import atexit
+import cProfile
 import csv
+import functools
+import gzip
+import hashlib
+import heapq
+import itertools
+import math
+import mmap
+import operator
 import os
-from datetime import datetime
+import pstats
+import re
+import shlex
+import sqlite3
+import sys
+import threading
+import traceback
+import tracemalloc
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import MutableMapping
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 NOTES_FILE = 'notes.json'
 TASKS_FILE = 'tasks.json'
 CONTACTS_FILE = 'contacts.json'
 FINANCE_FILE = 'finance.json'
+SQLITE_FILE = 'assistant.db'
+NOTES_INDEX_FILE = 'notes.index.json'
+
+STORAGE_BACKEND = os.environ.get('PA_STORAGE', 'journal')
+STORAGE_FORMAT = os.environ.get('PA_FORMAT')
+STORAGE_FORMATS = ('json', 'jsonl', 'zlib', 'pretty')
+BINARY_MAGIC = b'PAZ1'
+PROFILE = os.environ.get('PA_PROFILE')
+PROFILE_OPERATION = os.environ.get('PA_PROFILE_OP')
+COMPACT_THRESHOLD = 1000
+BLOB_COMPACT_MIN = 1024 * 1024
+IMPORT_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 1000
+DATE_CACHE_SIZE = 65536
+DATES_MIGRATED_FILE = 'dates.iso'
+SYNC_FILE = 'sync.json'
+PAGE_SIZE = 20
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+CALC_MAX_LENGTH = 1000
+CALC_MAX_NODES = 200
+CALC_MAX_EXPONENT = 1000
+CALC_MAX_BITS = 4096
+CALC_TIME_LIMIT = 0.05
+CALC_CACHE_SIZE = 256
+
+class Instrumentation:
+    def __init__(self):
+        self.enabled = False
+        self.target = None
+        self.output = None
+        self.stats = {}
+        self.active = []
+        self.depth = {}
+
+    def enable(self, target=None, output=None):
+        if not self.enabled:
+            atexit.register(self.report)
+        self.enabled = True
+        self.target = target or self.target
+        self.output = output or self.output
+
+    @contextmanager
+    def operation(self, name):
+        if self.depth.get(name):
+            self.stats[name][0] += 1
+            yield
+            return
+        entry = self.stats.setdefault(name, [0, 0.0, 0, 0, 0])
+        entry[0] += 1
+        self.depth[name] = 1
+        self.active.append(entry)
+        profiler = None
+        if name == self.target:
+            profiler = cProfile.Profile()
+            tracemalloc.start()
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry[1] += time.perf_counter() - start
+            self.active.pop()
+            self.depth[name] = 0
+            if profiler is not None:
+                profiler.disable()
+                self.capture(name, profiler)
+
+    def count(self, read=0, written=0, records=0):
+        for entry in self.active:
+            entry[2] += read
+            entry[3] += written
+            entry[4] += records
+
+    def capture(self, name, profiler):
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        filename = f'{name}.prof'
+        profiler.dump_stats(filename)
+        print(f"\nПрофиль {name} сохранён в {filename}", file=sys.stderr)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(15)
+        print(f"Пик памяти: {peak / 1024 / 1024:.2f} МБ, крупнейшие выделения:", file=sys.stderr)
+        for stat in snapshot.statistics('lineno')[:10]:
+            print(f"  {stat}", file=sys.stderr)
+
+    def report(self):
+        if not self.stats:
+            return
+        print(f"\n{'Операция':32} {'вызовы':>7} {'всего, мс':>11} {'среднее, мс':>12} {'прочитано, КБ':>14} {'записано, КБ':>13} {'записей':>9}", file=sys.stderr)
+        for name, (calls, elapsed, read, written, records) in sorted(self.stats.items(), key=lambda item: -item[1][1]):
+            print(f"{name:32} {calls:7} {elapsed * 1000:11.1f} {elapsed * 1000 / calls:12.2f} {read / 1024:14.1f} {written / 1024:13.1f} {records:9}", file=sys.stderr)
+        if self.output:
+            with open(self.output, 'w', encoding='utf-8') as file:
+                json.dump({
+                    name: {'calls': calls, 'seconds': elapsed, 'bytes_read': read, 'bytes_written': written, 'records': records}
+                    for name, (calls, elapsed, read, written, records) in self.stats.items()
+                }, file, ensure_ascii=False, indent=4)
+
+INSTRUMENTATION = Instrumentation()
+
+def instrumented(function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not INSTRUMENTATION.enabled:
+            return function(*args, **kwargs)
+        with INSTRUMENTATION.operation(function.__qualname__):
+            return function(*args, **kwargs)
+    return wrapper
+
+if PROFILE or PROFILE_OPERATION:
+    INSTRUMENTATION.enable(PROFILE_OPERATION, PROFILE if PROFILE and PROFILE.endswith('.json') else None)
 
 class Note:
-    def __init__(self, id, title, content, timestamp):
+    __slots__ = ('id', 'title', '_content', 'timestamp', 'version', 'modified')
+    FIELDS = ('id', 'title', 'content', 'timestamp', 'version', 'modified')
+
+    def __init__(self, id, title, content, timestamp, version=0, modified=''):
         self.id = id
         self.title = title
         self.content = content
         self.timestamp = timestamp
+        self.version = version
+        self.modified = modified
+
+    @property
+    def content(self):
+        if isinstance(self._content, BlobRef):
+            return self._content.read()
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        self._content = value
 
     def to_dict(self):
         return {
             'id': self.id,
             'title': self.title,
             'content': self.content,
-            'timestamp': self.timestamp
+            'timestamp': self.timestamp,
+            'version': self.version,
+            'modified': self.modified
         }
 
+    def to_row(self):
+        return self.id, self.title, self.content, self.timestamp, self.version, self.modified
+
+    def fingerprint(self):
+        return [f'{normalize_text(self.title).strip()}\0{normalize_text(self.content).strip()}']
+
     @staticmethod
     def from_dict(data):
         return Note(
             id=data['id'],
             title=data['title'],
             content=data['content'],
-            timestamp=data['timestamp']
+            timestamp=data['timestamp'],
+            version=data.get('version', 0),
+            modified=data.get('modified', '')
         )
 
+    @staticmethod
+    def from_row(row):
+        return Note(*row)
+
 class Task:
-    def __init__(self, id, title, description, done, priority, due_date):
+    __slots__ = FIELDS = ('id', 'title', 'description', 'done', 'priority', 'due_date', 'version', 'modified')
+
+    def __init__(self, id, title, description, done, priority, due_date, version=0, modified=''):
         self.id = id
         self.title = title
         self.description = description
         self.done = done
         self.priority = priority
         self.due_date = due_date
+        self.version = version
+        self.modified = modified
 
     def to_dict(self):
         return {
@@ -48,70 +231,2319 @@ class Task:
             'description': self.description,
             'done': self.done,
             'priority': self.priority,
-            'due_date': self.due_date
+            'due_date': self.due_date,
+            'version': self.version,
+            'modified': self.modified
+        }
+
+    def to_row(self):
+        return self.id, self.title, self.description, self.done, self.priority, self.due_date, self.version, self.modified
+
+    def fingerprint(self):
+        return [f'{normalize_text(self.title).strip()}\0{to_iso(self.due_date)}\0{normalize_text(self.description).strip()}']
+
+    @staticmethod
+    def from_dict(data):
+        return Task(
+            id=data['id'],
+            title=data['title'],
+            description=data['description'],
+            done=data['done'],
+            priority=data['priority'],
+            due_date=data['due_date'],
+            version=data.get('version', 0),
+            modified=data.get('modified', '')
+        )
+
+    @staticmethod
+    def from_row(row):
+        return Task(*row)
+
+class Contact:
+    __slots__ = FIELDS = ('id', 'name', 'phone', 'email', 'version', 'modified')
+
+    def __init__(self, id, name, phone, email, version=0, modified=''):
+        self.id = id
+        self.name = name
+        self.phone = phone
+        self.email = email
+        self.version = version
+        self.modified = modified
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'phone': self.phone,
+            'email': self.email,
+            'version': self.version,
+            'modified': self.modified
+        }
+
+    def to_row(self):
+        return self.id, self.name, self.phone, self.email, self.version, self.modified
+
+    def fingerprint(self):
+        keys = []
+        if normalize_phone(self.phone):
+            keys.append(f'phone\0{normalize_phone(self.phone)}')
+        if self.email.strip():
+            keys.append(f'email\0{self.email.strip().lower()}')
+        return keys or [f'name\0{normalize_text(self.name).strip()}']
+
+    @staticmethod
+    def from_dict(data):
+        return Contact(
+            id=data['id'],
+            name=data['name'],
+            phone=data['phone'],
+            email=data['email'],
+            version=data.get('version', 0),
+            modified=data.get('modified', '')
+        )
+
+    @staticmethod
+    def from_row(row):
+        return Contact(*row)
+
+class FinanceRecord:
+    __slots__ = FIELDS = ('id', 'amount', 'category', 'date', 'description', 'version', 'modified')
+
+    def __init__(self, id, amount, category, date, description, version=0, modified=''):
+        self.id = id
+        self.amount = amount
+        self.category = category
+        self.date = date
+        self.description = description
+        self.version = version
+        self.modified = modified
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'amount': self.amount,
+            'category': self.category,
+            'date': self.date,
+            'description': self.description,
+            'version': self.version,
+            'modified': self.modified
         }
 
-    @staticmethod
-    def from_dict(data):
-        return Task(
-            id=data['id'],
-            title=data['title'],
-            description=data['description'],
-            done=data['done'],
-            priority=data['priority'],
-            due_date=data['due_date']
-        )
+    def to_row(self):
+        return self.id, self.amount, self.category, self.date, self.description, self.version, self.modified
+
+    def fingerprint(self):
+        return [f'{to_iso(self.date)}\0{float(self.amount):.2f}\0{normalize_text(self.description).strip()}']
+
+    @staticmethod
+    def from_dict(data):
+        return FinanceRecord(
+            id=data['id'],
+            amount=data['amount'],
+            category=data['category'],
+            date=data['date'],
+            description=data['description'],
+            version=data.get('version', 0),
+            modified=data.get('modified', '')
+        )
+
+    @staticmethod
+    def from_row(row):
+        return FinanceRecord(*row)
+
+def file_signature(filename):
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def next_free_id(next_id, records):
+    return max([next_id] + [data['id'] + 1 for data in records])
+
+def encode_payload(payload, format):
+    if format == 'pretty':
+        return json.dumps(payload, ensure_ascii=False, indent=4).encode('utf-8')
+    if format == 'jsonl':
+        lines = payload
+        if isinstance(payload, dict):
+            lines = [{key: value for key, value in payload.items() if key != 'records'}] + payload['records']
+        return ''.join(json.dumps(line, ensure_ascii=False) + '\n' for line in lines).encode('utf-8')
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if format == 'zlib':
+        return BINARY_MAGIC + zlib.compress(data)
+    return data
+
+def decode_payload(data):
+    format = 'json'
+    if data.startswith(BINARY_MAGIC):
+        data = zlib.decompress(data[len(BINARY_MAGIC):])
+        format = 'zlib'
+    text = data.decode('utf-8')
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        payload = [json.loads(line) for line in text.splitlines() if line.strip()]
+        format = 'jsonl'
+    else:
+        if not isinstance(payload, dict) or 'records' in payload:
+            return payload, format
+        payload = [payload]
+        format = 'jsonl'
+    if payload and 'id' not in payload[0]:
+        return dict(payload[0], records=payload[1:]), format
+    return payload, format
+
+def read_format(filename):
+    try:
+        with open(filename, 'r', encoding='utf-8') as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def read_payload(filename):
+    with open(filename, 'rb') as file:
+        data = file.read()
+    if INSTRUMENTATION.enabled:
+        INSTRUMENTATION.count(read=len(data))
+    return decode_payload(data)
+
+@contextmanager
+def atomic_file(filename, mode='w'):
+    tmp_file = filename + '.tmp'
+    try:
+        with open(tmp_file, mode, encoding=None if 'b' in mode else 'utf-8') as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    if INSTRUMENTATION.enabled:
+        INSTRUMENTATION.count(written=os.path.getsize(tmp_file))
+    os.replace(tmp_file, filename)
+    if os.name == 'posix':
+        directory = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+class FileLock:
+    def __init__(self, filename):
+        self.filename = filename
+        self.thread_lock = threading.RLock()
+        self.file = None
+        self.depth = 0
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if self.depth == 0 and fcntl is not None:
+            self.file = open(self.filename, 'a')
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self.depth -= 1
+        if self.depth == 0 and self.file is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+        self.thread_lock.release()
+
+file_locks = {}
+
+def file_lock(filename):
+    path = os.path.abspath(filename)
+    if path not in file_locks:
+        file_locks[path] = FileLock(path)
+    return file_locks[path]
+
+class ConflictError(Exception):
+    pass
+
+class JsonFileStorage:
+    def __init__(self, filename):
+        self.filename = filename
+        self.counter_file = os.path.splitext(filename)[0] + '.seq'
+        self.format_file = os.path.splitext(filename)[0] + '.format'
+        self.lock = file_lock(os.path.splitext(filename)[0] + '.lock')
+        self.format = STORAGE_FORMAT
+        self.next_id = 1
+        self.batch = False
+        self.buffer = None
+
+    @instrumented
+    def load(self):
+        if self.buffer is not None:
+            return list(self.buffer)
+        if os.path.exists(self.counter_file):
+            with open(self.counter_file, 'r', encoding='utf-8') as file:
+                self.next_id = int(file.read() or 1)
+        if not os.path.exists(self.filename):
+            return []
+        records, format = read_payload(self.filename)
+        self.format = STORAGE_FORMAT or read_format(self.format_file) or format
+        self.next_id = next_free_id(self.next_id, records)
+        return records
+
+    @instrumented
+    def save(self, records):
+        if self.batch:
+            self.buffer = list(records)
+            self.next_id = next_free_id(self.next_id, records)
+            return
+        with self.lock:
+            with atomic_file(self.filename, 'wb') as file:
+                file.write(encode_payload(records, self.format or 'json'))
+            self.next_id = next_free_id(self.next_id, records)
+            with atomic_file(self.counter_file) as file:
+                file.write(str(self.next_id))
+
+    def put(self, record):
+        self.put_many([record])
+
+    @instrumented
+    def put_many(self, records):
+        with self.lock:
+            existing = self.load()
+            positions = {data['id']: index for index, data in enumerate(existing)}
+            for record in records:
+                if record['id'] in positions:
+                    existing[positions[record['id']]] = record
+                else:
+                    positions[record['id']] = len(existing)
+                    existing.append(record)
+            self.save(existing)
+
+    @instrumented
+    def delete(self, record_id):
+        with self.lock:
+            self.save([data for data in self.load() if data['id'] != record_id])
+
+    def begin_batch(self):
+        self.batch = True
+
+    def end_batch(self):
+        records, self.buffer = self.buffer, None
+        self.batch = False
+        if records is not None:
+            self.save(records)
+
+    def choose_format(self, format):
+        with atomic_file(self.format_file) as file:
+            file.write(format)
+        self.format = format
+
+    def signature(self):
+        return file_signature(self.filename)
+
+    def files(self):
+        return [self.filename, self.counter_file]
+
+class JournalStorage:
+    def __init__(self, filename):
+        base = os.path.splitext(filename)[0]
+        self.legacy_file = filename
+        self.snapshot_file = base + '.snapshot.json'
+        self.journal_file = base + '.journal'
+        self.format_file = base + '.format'
+        self.lock = file_lock(base + '.lock')
+        self.format = STORAGE_FORMAT
+        self.journal_entries = 0
+        self.snapshot_records = 0
+        self.pending = None
+        self.next_id = 1
+
+    @instrumented
+    def load(self):
+        self.migrate()
+        records = {}
+        self.next_id = 1
+        if os.path.exists(self.snapshot_file):
+            snapshot, format = read_payload(self.snapshot_file)
+            self.format = STORAGE_FORMAT or read_format(self.format_file) or format
+            if isinstance(snapshot, list):
+                snapshot = {'next_id': 1, 'records': snapshot}
+            self.next_id = next_free_id(snapshot['next_id'], snapshot['records'])
+            for data in snapshot['records']:
+                records[data['id']] = data
+            self.snapshot_records = len(snapshot['records'])
+        self.journal_entries = 0
+        if os.path.exists(self.journal_file):
+            if INSTRUMENTATION.enabled:
+                INSTRUMENTATION.count(read=os.path.getsize(self.journal_file))
+            with open(self.journal_file, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._apply(records, entry)
+                    self.journal_entries += 1
+        for entry in self.pending or []:
+            self._apply(records, entry)
+        return list(records.values())
+
+    @instrumented
+    def save(self, records):
+        self.next_id = next_free_id(self.next_id, records)
+        with self.lock:
+            with atomic_file(self.snapshot_file, 'wb') as file:
+                file.write(encode_payload({'next_id': self.next_id, 'records': records}, self.format or 'json'))
+            open(self.journal_file, 'w', encoding='utf-8').close()
+        self.journal_entries = 0
+        self.snapshot_records = len(records)
+
+    def put(self, record):
+        self.put_many([record])
+
+    @instrumented
+    def put_many(self, records):
+        self._append([{'op': 'put', 'data': record} for record in records])
+        self.next_id = next_free_id(self.next_id, records)
+
+    @instrumented
+    def delete(self, record_id):
+        self._append([{'op': 'del', 'id': record_id}])
+
+    def begin_batch(self):
+        self.pending = []
+
+    def end_batch(self):
+        entries, self.pending = self.pending, None
+        if entries:
+            self._append(entries)
+
+    @instrumented
+    def compact(self):
+        self.save(self.load())
+
+    def choose_format(self, format):
+        with atomic_file(self.format_file) as file:
+            file.write(format)
+        self.format = format
+
+    def signature(self):
+        return file_signature(self.snapshot_file), file_signature(self.journal_file)
+
+    def files(self):
+        return [self.snapshot_file, self.journal_file]
+
+    def migrate(self):
+        if os.path.exists(self.snapshot_file) or os.path.exists(self.journal_file):
+            return False
+        if not os.path.exists(self.legacy_file):
+            return False
+        records, format = read_payload(self.legacy_file)
+        seen = set()
+        next_id = next_free_id(1, records)
+        for data in records:
+            if data['id'] in seen:
+                data['id'] = next_id
+                next_id += 1
+            seen.add(data['id'])
+        self.save(records)
+        return True
+
+    def _apply(self, records, entry):
+        if entry['op'] == 'put':
+            records[entry['data']['id']] = entry['data']
+            self.next_id = max(self.next_id, entry['data']['id'] + 1)
+        elif entry['op'] == 'del':
+            records.pop(entry['id'], None)
+
+    def _append(self, entries):
+        self.migrate()
+        if self.pending is not None:
+            self.pending.extend(entries)
+            return
+        with self.lock:
+            self._truncate_torn_tail()
+            with open(self.journal_file, 'a', encoding='utf-8') as file:
+                start = file.tell()
+                for entry in entries:
+                    file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+                if INSTRUMENTATION.enabled:
+                    INSTRUMENTATION.count(written=file.tell() - start)
+            self.journal_entries += len(entries)
+            if self.journal_entries >= max(COMPACT_THRESHOLD, self.snapshot_records):
+                self.compact()
+
+    def _truncate_torn_tail(self):
+        if not os.path.exists(self.journal_file):
+            return
+        with open(self.journal_file, 'r+b') as file:
+            end = file.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - 4096)
+                file.seek(start)
+                index = file.read(position - start).rfind(b'\n')
+                if index >= 0:
+                    position = start + index + 1
+                    break
+                position = start
+            if position < end:
+                file.truncate(position)
+                file.flush()
+                os.fsync(file.fileno())
+
+class BlobFile:
+    def __init__(self, filename):
+        self.filename = filename
+        self.map = None
+
+    def read(self, offset, length):
+        if not length:
+            return ''
+        if self.map is None or offset + length > len(self.map):
+            with open(self.filename, 'rb') as file:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if INSTRUMENTATION.enabled:
+            INSTRUMENTATION.count(read=length)
+        return self.map[offset:offset + length].decode('utf-8')
+
+    def append(self, texts):
+        refs = []
+        with open(self.filename, 'ab') as file:
+            offset = file.tell()
+            for text in texts:
+                data = text.encode('utf-8')
+                file.write(data)
+                refs.append((offset, len(data)))
+                offset += len(data)
+            file.flush()
+            os.fsync(file.fileno())
+        if INSTRUMENTATION.enabled:
+            INSTRUMENTATION.count(written=sum(length for offset, length in refs))
+        return refs
+
+    def size(self):
+        return (file_signature(self.filename) or (0, 0))[1]
+
+class BlobRef:
+    def __init__(self, blob, generation, offset, length):
+        self.blob = blob
+        self.generation = generation
+        self.offset = offset
+        self.length = length
+
+    def read(self):
+        return self.blob.read(self.offset, self.length)
+
+class BlobStorage:
+    def __init__(self, storage, field, filename):
+        self.storage = storage
+        self.field = field
+        self.ref_field = field + '_ref'
+        self.base = os.path.splitext(filename)[0]
+        self.blobs = {}
+        self.generation = None
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+    @property
+    def next_id(self):
+        return self.storage.next_id
+
+    @next_id.setter
+    def next_id(self, value):
+        self.storage.next_id = value
+
+    @property
+    def format(self):
+        return self.storage.format
+
+    @format.setter
+    def format(self, value):
+        self.storage.format = value
+
+    @instrumented
+    def load(self):
+        with self.storage.lock:
+            records = self.storage.load()
+            live = sum(data[self.ref_field][2] for data in records if self.ref_field in data)
+            inline = any(self.field in data for data in records)
+            if inline or self.blob(self.current_generation()).size() > 2 * live + BLOB_COMPACT_MIN:
+                records = self.compact_blobs(records)
+        return [self.expand(data) for data in records]
+
+    def save(self, records):
+        with self.storage.lock:
+            self.storage.save(self.collapse(records))
+
+    def put(self, record):
+        self.put_many([record])
+
+    def put_many(self, records):
+        with self.storage.lock:
+            self.storage.put_many(self.collapse(records))
+
+    def migrate(self):
+        return hasattr(self.storage, 'migrate') and self.storage.migrate()
+
+    def blob(self, generation):
+        if generation not in self.blobs:
+            self.blobs[generation] = BlobFile(f'{self.base}.{generation}.blob')
+        return self.blobs[generation]
+
+    def generations(self):
+        pattern = re.compile(re.escape(os.path.basename(self.base)) + r'\.(\d+)\.blob$')
+        names = os.listdir(os.path.dirname(os.path.abspath(self.base)))
+        return sorted(int(match.group(1)) for match in map(pattern.match, names) if match)
+
+    def current_generation(self):
+        if self.generation is None or not os.path.exists(self.blob(self.generation).filename):
+            generations = self.generations()
+            self.generation = generations[-1] if generations else 0
+        return self.generation
+
+    def expand(self, data):
+        if self.ref_field not in data:
+            return data
+        data = dict(data)
+        generation, offset, length = data.pop(self.ref_field)
+        data[self.field] = BlobRef(self.blob(generation), generation, offset, length)
+        return data
+
+    def collapse(self, records):
+        texts = [data[self.field] for data in records if self.field in data and not isinstance(data[self.field], BlobRef)]
+        generation = self.current_generation()
+        refs = iter(self.blob(generation).append(texts) if texts else [])
+        stored = []
+        for data in records:
+            if self.field not in data:
+                stored.append(data)
+                continue
+            data = dict(data)
+            value = data.pop(self.field)
+            if isinstance(value, BlobRef):
+                data[self.ref_field] = [value.generation, value.offset, value.length]
+            else:
+                data[self.ref_field] = [generation] + list(next(refs))
+            stored.append(data)
+        return stored
+
+    @instrumented
+    def compact_blobs(self, records):
+        texts = []
+        for data in records:
+            value = self.expand(data).get(self.field, '')
+            texts.append(value.read() if isinstance(value, BlobRef) else value)
+        generation = self.current_generation() + 1
+        refs = self.blob(generation).append(texts)
+        stored = []
+        for data, (offset, length) in zip(records, refs):
+            data = {name: value for name, value in data.items() if name not in (self.field, self.ref_field)}
+            data[self.ref_field] = [generation, offset, length]
+            stored.append(data)
+        self.storage.save(stored)
+        self.generation = generation
+        for old in self.generations():
+            if old != generation:
+                os.remove(self.blob(old).filename)
+                self.blobs.pop(old, None)
+        return stored
+
+LEGACY_DATE = re.compile(r'(\d{1,2})-(\d{1,2})-(\d{4})(.*)', re.S)
+ISO_DATE = re.compile(r'(\d{4})-(\d{2})-(\d{2})(.*)', re.S)
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def to_iso(value):
+    match = LEGACY_DATE.fullmatch(value) if isinstance(value, str) else None
+    if match is None:
+        return value
+    day, month, year, rest = match.groups()
+    return f'{year}-{int(month):02d}-{int(day):02d}{rest}'
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def display_date(value):
+    match = ISO_DATE.fullmatch(value) if isinstance(value, str) else None
+    if match is None:
+        return value
+    year, month, day, rest = match.groups()
+    return f'{day}-{month}-{year}{rest}'
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def date_key(value):
+    value = to_iso(value)
+    if not isinstance(value, str) or len(value) != 10 or not ISO_DATE.fullmatch(value):
+        return None
+    try:
+        return date.fromisoformat(value).toordinal()
+    except ValueError:
+        return None
+
+SYNC_COLUMNS = {'version': 'INTEGER NOT NULL DEFAULT 0', 'modified': "TEXT NOT NULL DEFAULT ''"}
+
+SQLITE_SCHEMA = {
+    NOTES_FILE: {
+        'table': 'notes',
+        'columns': {'title': 'TEXT', 'content': 'TEXT', 'timestamp': 'TEXT', **SYNC_COLUMNS},
+        'keys': {},
+    },
+    TASKS_FILE: {
+        'table': 'tasks',
+        'columns': {'title': 'TEXT', 'description': 'TEXT', 'done': 'BOOLEAN', 'priority': 'TEXT', 'due_date': 'TEXT', **SYNC_COLUMNS},
+        'keys': {'due_key': ('due_date', date_key)},
+        'indexes': ['done', 'priority', 'due_key'],
+    },
+    CONTACTS_FILE: {
+        'table': 'contacts',
+        'columns': {'name': 'TEXT', 'phone': 'TEXT', 'email': 'TEXT', **SYNC_COLUMNS},
+        'keys': {'name_key': ('name', str.lower)},
+        'indexes': ['name_key', 'phone'],
+    },
+    FINANCE_FILE: {
+        'table': 'finance',
+        'columns': {'amount': 'REAL', 'category': 'TEXT', 'date': 'TEXT', 'description': 'TEXT', **SYNC_COLUMNS},
+        'keys': {'date_key': ('date', date_key)},
+        'indexes': ['date_key', 'category'],
+    },
+}
+
+sqlite_db = None
+sqlite_databases = {}
+
+def open_sqlite(filename):
+    connection = sqlite3.connect(filename, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, next_id INTEGER)')
+    return connection
+
+def sqlite_connection(filename=SQLITE_FILE):
+    global sqlite_db
+    if filename != SQLITE_FILE:
+        if filename not in sqlite_databases:
+            sqlite_databases[filename] = open_sqlite(filename)
+        return sqlite_databases[filename]
+    if sqlite_db is None:
+        sqlite_db = open_sqlite(filename)
+    return sqlite_db
+
+class SqliteStorage:
+    def __init__(self, filename, directory=''):
+        schema = SQLITE_SCHEMA[filename]
+        self.name = filename
+        self.database = os.path.join(directory, SQLITE_FILE)
+        self.legacy_file = os.path.join(directory, filename)
+        self.table = schema['table']
+        self.columns = schema['columns']
+        self.keys = schema['keys']
+        self.indexes = schema.get('indexes', [])
+        self.lock = file_lock(os.path.splitext(self.legacy_file)[0] + '.lock')
+        self.connection = None
+        self.batch = False
+        self.next_id = 1
+
+    def db(self):
+        if self.connection is None:
+            self.connection = sqlite_connection(self.database)
+            columns = [f'{name} {kind}' for name, kind in self.columns.items()] + list(self.keys)
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (id INTEGER PRIMARY KEY, {', '.join(columns)})")
+            existing = {row[1] for row in self.connection.execute(f'PRAGMA table_info({self.table})')}
+            for name, kind in self.columns.items():
+                if name not in existing:
+                    self.connection.execute(f'ALTER TABLE {self.table} ADD COLUMN {name} {kind}')
+            for column in self.indexes:
+                self.connection.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_{column} ON {self.table}({column})')
+            self.connection.commit()
+        return self.connection
+
+    def load(self):
+        return [self._to_dict(row) for row in self.load_rows()]
+
+    @instrumented
+    def load_rows(self):
+        self.migrate()
+        columns = ', '.join(self.columns)
+        rows = self.db().execute(f'SELECT id, {columns} FROM {self.table} ORDER BY id').fetchall()
+        booleans = [index for index, kind in enumerate(self.columns.values(), 1) if kind == 'BOOLEAN']
+        if booleans:
+            rows = [tuple(bool(value) if index in booleans else value for index, value in enumerate(row)) for row in rows]
+        counter = self.db().execute('SELECT next_id FROM counters WHERE name = ?', (self.table,)).fetchone()
+        self.next_id = max([counter[0] if counter else 1] + [row[0] + 1 for row in rows[-1:]])
+        return rows
+
+    def iter_query(self, where='1', params=(), order='id', limit=None):
+        columns = ', '.join(self.columns)
+        sql = f'SELECT id, {columns} FROM {self.table} WHERE {where} ORDER BY {order}'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        cursor = self.db().execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                yield self._to_dict(row)
+
+    def count(self, where='1', params=()):
+        return self.aggregate('COUNT(*)', where, params)[0]
+
+    def aggregate(self, expression, where='1', params=()):
+        return self.db().execute(f'SELECT {expression} FROM {self.table} WHERE {where}', params).fetchone()
+
+    def transaction(self):
+        connection = self.db()
+        return nullcontext() if self.batch else connection
+
+    @instrumented
+    def save(self, records):
+        self.save_rows([self._to_row(data) for data in records])
+
+    def save_rows(self, rows):
+        with self.transaction():
+            self.connection.execute(f'DELETE FROM {self.table}')
+            self._insert_rows(rows)
+
+    def put(self, record):
+        self.put_many([record])
+
+    @instrumented
+    def put_many(self, records):
+        self.put_rows([self._to_row(data) for data in records])
+
+    @instrumented
+    def put_rows(self, rows):
+        self.migrate()
+        with self.transaction():
+            self._insert_rows(rows)
+
+    @instrumented
+    def delete(self, record_id):
+        self.migrate()
+        with self.transaction():
+            self.connection.execute(f'DELETE FROM {self.table} WHERE id = ?', (record_id,))
+
+    def begin_batch(self):
+        self.batch = True
+
+    def end_batch(self):
+        self.batch = False
+        self.db().commit()
+
+    def signature(self):
+        return self.db().execute('PRAGMA data_version').fetchone()[0]
+
+    def files(self):
+        return [self.database, self.database + '-wal']
+
+    def migrate(self):
+        if self.db().execute('SELECT 1 FROM counters WHERE name = ?', (self.table,)).fetchone():
+            return False
+        source = JournalStorage(self.legacy_file)
+        if not (os.path.exists(source.snapshot_file) or os.path.exists(source.journal_file)):
+            source = JsonFileStorage(self.legacy_file)
+        blobs = None
+        if self.name in BLOB_FIELDS:
+            blobs = BlobStorage(source, BLOB_FIELDS[self.name], self.legacy_file)
+        records = []
+        for data in source.load():
+            if blobs is not None:
+                data = blobs.expand(data)
+            records.append(dict({'version': 0, 'modified': ''}, **{name: value.read() if isinstance(value, BlobRef) else value for name, value in data.items()}))
+        self.next_id = source.next_id
+        with self.db():
+            self._insert_rows([self._to_row(data) for data in records])
+        return bool(records)
+
+    def _insert_rows(self, rows):
+        names = ['id'] + list(self.columns) + list(self.keys)
+        placeholders = ', '.join('?' * len(names))
+        positions = {name: index for index, name in enumerate(self.columns, 1)}
+        keys = [(positions[column], function) for column, function in self.keys.values()]
+        if keys:
+            rows = [tuple(row) + tuple(function(row[position]) for position, function in keys) for row in rows]
+        self.connection.executemany(f"INSERT OR REPLACE INTO {self.table} ({', '.join(names)}) VALUES ({placeholders})", rows)
+        self.next_id = max([self.next_id] + [row[0] + 1 for row in rows])
+        self.connection.execute(
+            'INSERT INTO counters (name, next_id) VALUES (?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET next_id = MAX(next_id, excluded.next_id)',
+            (self.table, self.next_id)
+        )
+
+    def _to_row(self, data):
+        return (data['id'],) + tuple(data[name] for name in self.columns)
+
+    def _to_dict(self, row):
+        data = {'id': row[0]}
+        for (name, kind), value in zip(self.columns.items(), row[1:]):
+            data[name] = bool(value) if kind == 'BOOLEAN' else value
+        return data
+
+BLOB_FIELDS = {NOTES_FILE: 'content'}
+
+def make_storage(filename, directory=''):
+    if STORAGE_BACKEND == 'sqlite':
+        return SqliteStorage(filename, directory)
+    path = os.path.join(directory, filename)
+    storage = JsonFileStorage(path) if STORAGE_BACKEND == 'json' else JournalStorage(path)
+    if filename in BLOB_FIELDS:
+        return BlobStorage(storage, BLOB_FIELDS[filename], path)
+    return storage
+
+NOTES_STORAGE = make_storage(NOTES_FILE)
+TASKS_STORAGE = make_storage(TASKS_FILE)
+CONTACTS_STORAGE = make_storage(CONTACTS_FILE)
+FINANCE_STORAGE = make_storage(FINANCE_FILE)
+STORAGES = (NOTES_STORAGE, TASKS_STORAGE, CONTACTS_STORAGE, FINANCE_STORAGE)
+DATE_FIELDS = (
+    ("Заметки", NOTES_FILE, NOTES_STORAGE, 'timestamp'),
+    ("Задачи", TASKS_FILE, TASKS_STORAGE, 'due_date'),
+    ("Финансы", FINANCE_FILE, FINANCE_STORAGE, 'date'),
+)
+
+@contextmanager
+def batch_writes():
+    for storage in STORAGES:
+        storage.begin_batch()
+    try:
+        yield
+    finally:
+        for storage in STORAGES:
+            storage.end_batch()
+
+def change_stamp():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+class Tombstones:
+    def __init__(self, filename):
+        self.filename = filename
+        self.entries = {}
+        self.signature = None
+
+    def load(self):
+        signature = file_signature(self.filename)
+        if signature != self.signature:
+            self.entries = {}
+            if signature is not None:
+                with open(self.filename, 'r', encoding='utf-8') as file:
+                    self.entries = {record_id: (version, modified) for record_id, version, modified in json.load(file)}
+            self.signature = signature
+        return self.entries
+
+    def add(self, record_id, version, modified):
+        self.load()[record_id] = (version, modified)
+        self.save()
+
+    def discard(self, record_ids):
+        entries = self.load()
+        removed = [entries.pop(record_id) for record_id in record_ids if record_id in entries]
+        if removed:
+            self.save()
+
+    def save(self):
+        with atomic_file(self.filename) as file:
+            json.dump([[record_id, version, modified] for record_id, (version, modified) in sorted(self.entries.items())], file)
+        self.signature = file_signature(self.filename)
+
+def fingerprint_hash(key):
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+
+class FingerprintIndex:
+    def __init__(self, filename):
+        self.filename = filename
+        self.rebuild([])
+
+    def rebuild(self, records):
+        self.source = records
+        self.files = None
+        self.ready = False
+
+    def warm(self):
+        if not self.ready:
+            self.build()
+
+    def build(self):
+        self.ready = True
+        self.keys = {}
+        self.owners = {}
+        if self.files is not None and self._load():
+            self.dirty = False
+            return
+        for record in self.source:
+            self.add(record)
+        self.dirty = True
+
+    def index_keys(self, record):
+        return [fingerprint_hash(key) for key in record.fingerprint()]
+
+    def add(self, record, keys=None):
+        if not self.ready:
+            self.build()
+        self.remove(record.id)
+        self._index(record.id, self.index_keys(record) if keys is None else keys)
+
+    def remove(self, record_id):
+        if not self.ready:
+            self.build()
+        for key in self.keys.pop(record_id, ()):
+            owners = self.owners[key]
+            owners.remove(record_id)
+            if not owners:
+                del self.owners[key]
+        self.dirty = True
+
+    def find(self, record):
+        if not self.ready:
+            self.build()
+        found = []
+        for key in record.fingerprint():
+            for record_id in self.owners.get(fingerprint_hash(key), ()):
+                if record_id not in found:
+                    found.append(record_id)
+        return found
+
+    def groups(self):
+        if not self.ready:
+            self.build()
+        parents = {}
+
+        def root(record_id):
+            while parents.get(record_id, record_id) != record_id:
+                record_id = parents[record_id]
+            return record_id
+
+        for owners in self.owners.values():
+            first = root(owners[0])
+            for record_id in owners[1:]:
+                other = root(record_id)
+                if other != first:
+                    parents[max(first, other)] = min(first, other)
+                    first = min(first, other)
+        groups = {}
+        for record_id in parents:
+            groups.setdefault(root(record_id), [root(record_id)]).append(record_id)
+        return sorted(sorted(group) for group in groups.values())
+
+    def restore(self, files, records):
+        self.rebuild(records)
+        self.files = files
+        return True
+
+    def persist(self, files):
+        if not self.ready or not self.dirty:
+            return
+        with atomic_file(self.filename) as file:
+            json.dump({'files': files, 'keys': self.keys}, file)
+        self.dirty = False
+
+    def _load(self):
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if data.get('files') != self.files:
+            return False
+        for record_id, keys in data['keys'].items():
+            self._index(int(record_id), keys)
+        return True
+
+    def _index(self, record_id, keys):
+        self.keys[record_id] = keys
+        for key in keys:
+            self.owners.setdefault(key, []).append(record_id)
+        self.dirty = True
+
+class Repository:
+    def __init__(self, storage, record_class, indexes=()):
+        self.storage = storage
+        self.record_class = record_class
+        self.tombstones = Tombstones(os.path.splitext(storage.lock.filename)[0] + '.tombstones.json')
+        self.fingerprints = FingerprintIndex(os.path.splitext(storage.lock.filename)[0] + '.fingerprints.json')
+        self.indexes = list(indexes) + [self.fingerprints]
+        self.records = self.create_records()
+        self.checked_out = {}
+        self.signature = None
+        self.loaded = False
+        self.pinned = False
+        self.sorted_ids = None
+
+    def create_records(self):
+        return {}
+
+    def stale(self):
+        return not self.loaded or self.storage.signature() != self.signature
+
+    @instrumented
+    def refresh(self):
+        if self.pinned:
+            return
+        signature = self.storage.signature()
+        if self.loaded and signature == self.signature:
+            return
+        records = self.create_records()
+        with self.storage.lock:
+            if hasattr(self.storage, 'load_rows'):
+                decoded = map(self.record_class.from_row, self.storage.load_rows())
+            else:
+                decoded = map(self.record_class.from_dict, self.storage.load())
+            for record in decoded:
+                records[record.id] = record
+            self.signature = self.storage.signature()
+        if INSTRUMENTATION.enabled:
+            INSTRUMENTATION.count(records=len(records))
+        self.records = records
+        self.sorted_ids = None
+        self.loaded = True
+        files = self.files_signature()
+        for index in self.indexes:
+            if not (hasattr(index, 'restore') and index.restore(files, records.values())):
+                index.rebuild(records.values())
+
+    def warm_indexes(self):
+        self.refresh()
+        for index in self.indexes:
+            if hasattr(index, 'warm'):
+                index.warm()
+
+    def files_signature(self):
+        return [list(file_signature(name) or []) for name in self.storage.files()]
+
+    def persist_indexes(self):
+        with self.storage.lock:
+            if not self.loaded or self.storage.signature() != self.signature:
+                return
+            files = self.files_signature()
+            for index in self.indexes:
+                if hasattr(index, 'persist'):
+                    index.persist(files)
+
+    def all(self):
+        self.refresh()
+        return list(self.records.values())
+
+    def get(self, record_id):
+        self.refresh()
+        return self.records.get(record_id)
+
+    def checkout(self, record_id):
+        record = self.get(record_id)
+        if record is not None:
+            self.checked_out[record_id] = record.to_dict()
+        return record
+
+    def check_versions(self, records):
+        for record in records:
+            base = self.checked_out.pop(record.id, None)
+            current = self.records.get(record.id)
+            if base is not None and current is not record and (current is None or current.to_dict() != base):
+                raise ConflictError("Запись изменена другим процессом, изменения не сохранены.")
+
+    def allocate_id(self):
+        self.refresh()
+        record_id = self.storage.next_id
+        self.storage.next_id += 1
+        return record_id
+
+    def add(self, record):
+        with self.storage.lock:
+            if self.exists(record.id):
+                record.id = self.allocate_id()
+            self.add_many([record])
+
+    def exists(self, record_id):
+        if not self.loaded and hasattr(self.storage, 'count'):
+            return self.storage.count('id = ?', (record_id,)) > 0
+        return self.get(record_id) is not None
+
+    def add_many(self, records, touch=True):
+        if not records:
+            return
+        if touch:
+            modified = change_stamp()
+            for record in records:
+                record.version += 1
+                record.modified = modified
+        keys = [self.index_keys(record) for record in records]
+        with self.storage.lock:
+            if not self.loaded:
+                self.put_records(records)
+                return
+            self.refresh()
+            self.check_versions(records)
+            self.put_records(records)
+            for record, record_keys in zip(records, keys):
+                if self.sorted_ids is not None and record.id not in self.records:
+                    insort(self.sorted_ids, record.id)
+                self.records[record.id] = record
+                for index, index_keys in zip(self.indexes, record_keys):
+                    if index_keys is None:
+                        index.add(record)
+                    else:
+                        index.add(record, index_keys)
+            self.signature = self.storage.signature()
+
+    def put_records(self, records):
+        if hasattr(self.storage, 'put_rows'):
+            self.storage.put_rows([record.to_row() for record in records])
+        else:
+            self.storage.put_many([record.to_dict() for record in records])
+
+    def index_keys(self, record):
+        return [index.index_keys(record) if hasattr(index, 'index_keys') else None for index in self.indexes]
+
+    def update(self, record):
+        self.add_many([record])
+
+    def remove(self, record_id, version=None, modified=None):
+        with self.storage.lock:
+            self.refresh()
+            self.checked_out.pop(record_id, None)
+            record = self.records.get(record_id)
+            if version is None:
+                if record is None:
+                    return False
+                version, modified = record.version + 1, change_stamp()
+            self.tombstones.add(record_id, version, modified)
+            if record is None:
+                return False
+            self.storage.delete(record_id)
+            del self.records[record_id]
+            if self.sorted_ids is not None:
+                del self.sorted_ids[bisect_left(self.sorted_ids, record_id)]
+            for index in self.indexes:
+                index.remove(record_id)
+            self.signature = self.storage.signature()
+        return True
+
+    def find(self, predicate, where=None, params=()):
+        return list(self.iter(predicate, where, params))
+
+    def iter(self, predicate=None, where=None, params=()):
+        scanned = 0
+        try:
+            if hasattr(self.storage, 'iter_query'):
+                for data in self.storage.iter_query(where or '1', params):
+                    scanned += 1
+                    record = self.record_class.from_dict(data)
+                    if predicate is None or predicate(record):
+                        yield record
+                return
+            self.refresh()
+            for record in self.records.values():
+                scanned += 1
+                if predicate is None or predicate(record):
+                    yield record
+        finally:
+            if INSTRUMENTATION.enabled:
+                INSTRUMENTATION.count(records=scanned)
+
+    def count(self):
+        if hasattr(self.storage, 'count'):
+            return self.storage.count()
+        return len(self.all())
+
+    def page(self, cursor=None, limit=PAGE_SIZE, newest_first=True):
+        fetch = None if limit is None else limit + 1
+        if not self.loaded and hasattr(self.storage, 'iter_query'):
+            where, params = '1', ()
+            if cursor is not None:
+                where, params = ('id < ?' if newest_first else 'id > ?'), (cursor,)
+            rows = self.storage.iter_query(where, params, 'id DESC' if newest_first else 'id', fetch)
+            records = [self.record_class.from_dict(data) for data in rows]
+        else:
+            self.refresh()
+            if self.sorted_ids is None:
+                self.sorted_ids = sorted(self.records)
+            ids = self.sorted_ids
+            if newest_first:
+                end = len(ids) if cursor is None else bisect_left(ids, cursor)
+                selected = ids[0 if fetch is None else max(0, end - fetch):end][::-1]
+            else:
+                start = 0 if cursor is None else bisect_right(ids, cursor)
+                selected = ids[start:None if fetch is None else start + fetch]
+            records = [self.records[record_id] for record_id in selected]
+        if limit is None or len(records) <= limit:
+            return records, None
+        return records[:limit], records[limit - 1].id
+
+    def pages(self, limit=PAGE_SIZE, newest_first=True, cursor=None):
+        while True:
+            records, cursor = self.page(cursor, limit, newest_first)
+            if records:
+                yield records
+            if cursor is None:
+                return
+
+    def replace_all(self, records):
+        with self.storage.lock:
+            if hasattr(self.storage, 'save_rows'):
+                self.storage.save_rows([record.to_row() for record in records])
+            else:
+                self.storage.save([record.to_dict() for record in records])
+            self.signature = self.storage.signature()
+        self.records = self.create_records()
+        for record in records:
+            self.records[record.id] = record
+        self.sorted_ids = None
+        self.loaded = True
+        for index in self.indexes:
+            index.rebuild(self.records.values())
+
+class FinanceRollup:
+    def __init__(self):
+        self.rebuild([])
+
+    def rebuild(self, records):
+        self.entries = {}
+        self.days = {}
+        self.months = {}
+        self.categories = {}
+        self.total = [0.0, 0.0, 0]
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        self.remove(record.id)
+        day = date_key(record.date)
+        month = None
+        if day is not None:
+            month = date.fromordinal(day).replace(day=1).toordinal()
+        entry = (record.amount, day, month, record.category)
+        self.entries[record.id] = entry
+        self._apply(entry, 1)
+
+    def remove(self, record_id):
+        entry = self.entries.pop(record_id, None)
+        if entry:
+            self._apply(entry, -1)
+
+    def period(self, start_key, end_key):
+        totals = [0.0, 0.0, 0]
+        if end_key - start_key > len(self.days):
+            buckets = [bucket for day, bucket in self.days.items() if start_key <= day <= end_key]
+        else:
+            buckets = self._walk(start_key, end_key)
+        for bucket in buckets:
+            for position in range(3):
+                totals[position] += bucket[position]
+        return tuple(totals)
+
+    def _walk(self, start_key, end_key):
+        day = start_key
+        while day <= end_key:
+            first = date.fromordinal(day)
+            if first >= date.max.replace(day=1):
+                next_month = date.max.toordinal() + 1
+            else:
+                next_month = (first.replace(day=28) + timedelta(days=4)).replace(day=1).toordinal()
+            if first.day == 1 and next_month - 1 <= end_key:
+                bucket = self.months.get(day)
+                day = next_month
+            else:
+                bucket = self.days.get(day)
+                day += 1
+            if bucket:
+                yield bucket
+
+    def _apply(self, entry, sign):
+        amount, day, month, category = entry
+        buckets = [self.total]
+        for table, key in ((self.days, day), (self.months, month), (self.categories, category)):
+            if key is not None:
+                buckets.append(table.setdefault(key, [0.0, 0.0, 0]))
+        for bucket in buckets:
+            bucket[0 if amount > 0 else 1] += sign * amount
+            bucket[2] += sign
+        for table, key in ((self.days, day), (self.months, month), (self.categories, category)):
+            if key is not None and not table[key][2]:
+                del table[key]
+
+def month_key(day):
+    value = date.fromordinal(day)
+    return value.year * 12 + value.month - 1
+
+def format_month(key):
+    return f'{key % 12 + 1:02d}-{key // 12}'
+
+class FinanceColumns(MutableMapping):
+    def __init__(self):
+        self.ids = array('q')
+        self.amounts = array('d')
+        self.days = array('i')
+        self.months = array('i')
+        self.categories = array('i')
+        self.descriptions = []
+        self.versions = array('q')
+        self.modified = []
+        self.category_names = []
+        self.category_codes = {}
+        self.raw_dates = {}
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __contains__(self, record_id):
+        return record_id in self.positions
+
+    def __getitem__(self, record_id):
+        position = self.positions[record_id]
+        day = self.days[position]
+        return FinanceRecord(
+            id=record_id,
+            amount=self.amounts[position],
+            category=self.category_names[self.categories[position]],
+            date=date.fromordinal(day).isoformat() if day else self.raw_dates[record_id],
+            description=self.descriptions[position],
+            version=self.versions[position],
+            modified=self.modified[position]
+        )
+
+    def __setitem__(self, record_id, record):
+        code = self.category_codes.get(record.category)
+        if code is None:
+            code = self.category_codes[record.category] = len(self.category_names)
+            self.category_names.append(record.category)
+        day = date_key(record.date) or 0
+        self.raw_dates.pop(record_id, None)
+        if not day:
+            self.raw_dates[record_id] = record.date
+        row = (record_id, record.amount, day, month_key(day) if day else 0, code, record.version, record.description, record.modified)
+        columns = (self.ids, self.amounts, self.days, self.months, self.categories, self.versions, self.descriptions, self.modified)
+        position = self.positions.get(record_id)
+        if position is None:
+            self.positions[record_id] = len(self.ids)
+            for column, value in zip(columns, row):
+                column.append(value)
+        else:
+            for column, value in zip(columns, row):
+                column[position] = value
+
+    def __delitem__(self, record_id):
+        position = self.positions.pop(record_id)
+        self.raw_dates.pop(record_id, None)
+        last = len(self.ids) - 1
+        for column in (self.ids, self.amounts, self.days, self.months, self.categories, self.versions, self.descriptions, self.modified):
+            column[position] = column[last]
+            column.pop()
+        if position != last:
+            self.positions[self.ids[position]] = position
+
+    def category_report(self, start_key, end_key):
+        size = len(self.category_names)
+        if numpy is not None:
+            amounts, days, months, codes = self._numpy_columns()
+            mask = (days >= start_key) & (days <= end_key)
+            selected, selected_codes = amounts[mask], codes[mask]
+            rows = zip(
+                self.category_names,
+                numpy.bincount(selected_codes, weights=numpy.maximum(selected, 0), minlength=size).tolist(),
+                numpy.bincount(selected_codes, weights=numpy.minimum(selected, 0), minlength=size).tolist(),
+                numpy.bincount(selected_codes, minlength=size).tolist()
+            )
+        else:
+            totals = [[0.0, 0.0, 0] for index in range(size)]
+            for amount, day, code in zip(self.amounts, self.days, self.categories):
+                if start_key <= day <= end_key:
+                    bucket = totals[code]
+                    bucket[0 if amount > 0 else 1] += amount
+                    bucket[2] += 1
+            rows = ((name, *bucket) for name, bucket in zip(self.category_names, totals))
+        return {name: (income, expense, count) for name, income, expense, count in rows if count}
+
+    def monthly_trend(self, start_key, end_key):
+        if not start_key <= end_key:
+            return []
+        first_month, last_month = month_key(start_key), month_key(end_key)
+        if numpy is not None:
+            amounts, days, months, codes = self._numpy_columns()
+            dated = days > 0
+            base = int(months[dated].min()) if dated.any() else first_month
+            size = max(last_month - base + 1, 0)
+            positions = months[dated] - base
+            inside = positions < size
+            closing = numpy.cumsum(numpy.bincount(positions[inside], weights=amounts[dated][inside], minlength=size)).tolist()
+            mask = (days >= start_key) & (days <= end_key)
+            selected, selected_months = amounts[mask], months[mask] - base
+            income = numpy.bincount(selected_months, weights=numpy.maximum(selected, 0), minlength=size).tolist()
+            expense = numpy.bincount(selected_months, weights=numpy.minimum(selected, 0), minlength=size).tolist()
+            counts = numpy.bincount(selected_months, minlength=size).tolist()
+            return [
+                (base + index, income[index], expense[index], closing[index])
+                for index in range(max(first_month - base, 0), size) if counts[index]
+            ]
+        totals = {}
+        net = {}
+        for amount, day, month in zip(self.amounts, self.days, self.months):
+            if not day or month > last_month:
+                continue
+            net[month] = net.get(month, 0.0) + amount
+            if start_key <= day <= end_key:
+                bucket = totals.setdefault(month, [0.0, 0.0])
+                bucket[0 if amount > 0 else 1] += amount
+        trend = []
+        balance = 0.0
+        for month in sorted(net):
+            balance += net[month]
+            if month in totals:
+                trend.append((month, totals[month][0], totals[month][1], balance))
+        return trend
+
+    def running_balance(self, start_key, end_key):
+        if numpy is not None:
+            amounts, days, months, codes = self._numpy_columns()
+            dated = (days > 0) & (days <= end_key)
+            if not dated.any():
+                return []
+            base = int(days[dated].min())
+            positions = days[dated] - base
+            balance = numpy.cumsum(numpy.bincount(positions, weights=amounts[dated]))
+            active = numpy.flatnonzero(numpy.bincount(positions))
+            active = active[active + base >= start_key]
+            return list(zip((active + base).tolist(), balance[active].tolist()))
+        daily = {}
+        for amount, day in zip(self.amounts, self.days):
+            if day and day <= end_key:
+                daily[day] = daily.get(day, 0.0) + amount
+        series = []
+        balance = 0.0
+        for day in sorted(daily):
+            balance += daily[day]
+            if day >= start_key:
+                series.append((day, balance))
+        return series
+
+    def _numpy_columns(self):
+        return (
+            numpy.array(self.amounts, dtype=numpy.float64),
+            numpy.array(self.days, dtype=numpy.int64),
+            numpy.array(self.months, dtype=numpy.int64),
+            numpy.array(self.categories, dtype=numpy.int64)
+        )
+
+class FinanceRepository(Repository):
+    def __init__(self, storage):
+        self.rollup = FinanceRollup()
+        super().__init__(storage, FinanceRecord, [self.rollup])
+
+    def create_records(self):
+        return FinanceColumns()
+
+    def category_report(self, start_key, end_key):
+        self.refresh()
+        return self.records.category_report(start_key, end_key)
+
+    def monthly_trend(self, start_key, end_key):
+        self.refresh()
+        return self.records.monthly_trend(start_key, end_key)
+
+    def running_balance(self, start_key, end_key):
+        self.refresh()
+        return self.records.running_balance(start_key, end_key)
+
+    def balance(self):
+        if not self.loaded and hasattr(self.storage, 'aggregate'):
+            return self.storage.aggregate('TOTAL(amount)')[0]
+        self.refresh()
+        return self.rollup.total[0] + self.rollup.total[1]
+
+    def period_totals(self, start_key, end_key):
+        if not self.loaded and hasattr(self.storage, 'aggregate'):
+            return self.storage.aggregate(
+                'TOTAL(MAX(amount, 0)), TOTAL(MIN(amount, 0)), COUNT(*)',
+                'date_key BETWEEN ? AND ?',
+                (start_key, end_key)
+            )
+        self.refresh()
+        return self.rollup.period(start_key, end_key)
+
+    def category_totals(self):
+        self.refresh()
+        return {category: tuple(bucket) for category, bucket in self.rollup.categories.items()}
+
+def tokenize(text):
+    return re.findall(r'\w+', text.lower().replace('ё', 'е'))
+
+class NotesIndex:
+    def __init__(self, filename):
+        self.filename = filename
+        self.rebuild([])
+
+    def rebuild(self, records):
+        self.source = records
+        self.files = None
+        self.ready = False
+
+    def warm(self):
+        if not self.ready:
+            self.build()
+        if self.terms is None:
+            self.terms = sorted(self.postings)
+
+    def build(self):
+        self.ready = True
+        self.docs = {}
+        self.postings = {}
+        self.terms = None
+        if self.files is not None and self._load():
+            self.dirty = False
+            return
+        for record in self.source:
+            self.add(record)
+        self.dirty = True
+
+    def index_keys(self, record):
+        counts = {}
+        for token in tokenize(record.title) + tokenize(record.content):
+            counts[token] = counts.get(token, 0) + 1
+        return counts
+
+    def add(self, record, keys=None):
+        if not self.ready:
+            self.build()
+        self.remove(record.id)
+        self._index(record.id, self.index_keys(record) if keys is None else keys)
+
+    def remove(self, record_id):
+        if not self.ready:
+            self.build()
+        counts = self.docs.pop(record_id, None)
+        if counts is None:
+            return
+        for token in counts:
+            postings = self.postings[token]
+            del postings[record_id]
+            if not postings:
+                del self.postings[token]
+                if self.terms is not None:
+                    del self.terms[bisect_left(self.terms, token)]
+        self.dirty = True
+
+    def search(self, query):
+        if not self.ready:
+            self.build()
+        scores = None
+        for term in tokenize(query):
+            term_scores = {}
+            for token in self.prefixed(term):
+                for record_id, count in self.postings[token].items():
+                    term_scores[record_id] = term_scores.get(record_id, 0) + count
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {record_id: score + term_scores[record_id] for record_id, score in scores.items() if record_id in term_scores}
+        return sorted((scores or {}).items(), key=lambda item: (-item[1], item[0]))
+
+    def prefixed(self, prefix):
+        if self.terms is None:
+            self.terms = sorted(self.postings)
+        position = bisect_left(self.terms, prefix)
+        tokens = []
+        while position < len(self.terms) and self.terms[position].startswith(prefix):
+            tokens.append(self.terms[position])
+            position += 1
+        return tokens
+
+    def restore(self, files, records):
+        self.rebuild(records)
+        self.files = files
+        return True
+
+    def persist(self, files):
+        if not self.ready or not self.dirty:
+            return
+        with atomic_file(self.filename) as file:
+            json.dump({'files': files, 'docs': self.docs}, file, ensure_ascii=False)
+        self.dirty = False
+
+    def _load(self):
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if data.get('files') != self.files:
+            return False
+        for record_id, counts in data['docs'].items():
+            self._index(int(record_id), counts)
+        return True
+
+    def _index(self, record_id, counts):
+        self.docs[record_id] = counts
+        for token, count in counts.items():
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = {}
+                if self.terms is not None:
+                    insort(self.terms, token)
+            postings[record_id] = count
+        self.dirty = True
+
+class NotesRepository(Repository):
+    def __init__(self, storage):
+        self.index = NotesIndex(NOTES_INDEX_FILE)
+        super().__init__(storage, Note, [self.index])
+
+    def search(self, query):
+        self.refresh()
+        return [(self.records[record_id], score) for record_id, score in self.index.search(query)]
+
+NOTES = NotesRepository(NOTES_STORAGE)
+PRIORITY_RANKS = {'Высокий': 0, 'Средний': 1, 'Низкий': 2}
+NO_DUE_DATE = date.max.toordinal() + 1
+
+class TaskSchedule:
+    def __init__(self):
+        self.rebuild([])
+
+    def rebuild(self, records):
+        self.entries = {}
+        for record in records:
+            if not record.done:
+                self.entries[record.id] = self._key(record)
+        self.keys = sorted(self.entries.values())
+
+    def add(self, record):
+        self.remove(record.id)
+        if record.done:
+            return
+        key = self._key(record)
+        self.entries[record.id] = key
+        insort(self.keys, key)
+
+    def remove(self, record_id):
+        key = self.entries.pop(record_id, None)
+        if key is not None:
+            del self.keys[bisect_left(self.keys, key)]
+
+    def between(self, start_key=None, end_key=None):
+        first = 0 if start_key is None else bisect_left(self.keys, (start_key,))
+        last = len(self.keys) if end_key is None else bisect_left(self.keys, (end_key + 1,))
+        return [key[2] for key in self.keys[first:last]]
+
+    def top(self, count):
+        return [key[2] for key in self.keys[:count]]
+
+    def _key(self, record):
+        return (date_key(record.due_date) or NO_DUE_DATE, PRIORITY_RANKS.get(record.priority, len(PRIORITY_RANKS)), record.id)
+
+class AttributeIndex:
+    def __init__(self, attribute):
+        self.attribute = attribute
+        self.rebuild([])
+
+    def rebuild(self, records):
+        self.entries = {}
+        self.values = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        self.remove(record.id)
+        value = getattr(record, self.attribute)
+        self.entries[record.id] = value
+        self.values.setdefault(value, set()).add(record.id)
+
+    def remove(self, record_id):
+        if record_id not in self.entries:
+            return
+        value = self.entries.pop(record_id)
+        ids = self.values[value]
+        ids.discard(record_id)
+        if not ids:
+            del self.values[value]
+
+    def get(self, value):
+        return self.values.get(value, set())
+
+TASK_SORT_KEYS = {
+    'due': lambda task: date_key(task.due_date) or NO_DUE_DATE,
+    'priority': lambda task: PRIORITY_RANKS.get(task.priority, len(PRIORITY_RANKS)),
+    'title': lambda task: normalize_text(task.title),
+    'id': lambda task: task.id,
+}
+
+def sort_records(records, order_by, sort_keys, limit=None):
+    fields = [field.lstrip('-') for field in order_by]
+    descending = [field.startswith('-') for field in order_by]
+    key = lambda record: tuple(sort_keys[field](record) for field in fields)
+    if limit is not None and len(set(descending)) == 1:
+        return (heapq.nlargest if descending[0] else heapq.nsmallest)(limit, records, key=key)
+    records = list(records)
+    for field, reverse in reversed(list(zip(fields, descending))):
+        records.sort(key=sort_keys[field], reverse=reverse)
+    return records
+
+class TasksRepository(Repository):
+    def __init__(self, storage):
+        self.schedule = TaskSchedule()
+        self.priorities = AttributeIndex('priority')
+        self.statuses = AttributeIndex('done')
+        super().__init__(storage, Task, [self.schedule, self.priorities, self.statuses])
+
+    def query(self, done=None, priority=None, due_from=None, due_to=None, text=None, order_by=(), limit=None, offset=0):
+        conditions = []
+        if done is not None:
+            conditions.append((lambda task: task.done == done, 'done = ?', (done,)))
+        if priority is not None:
+            conditions.append((lambda task: task.priority == priority, 'priority = ?', (priority,)))
+        conditions += date_conditions(lambda task: task.due_date, 'due_key', due_from, due_to)
+        if text:
+            needle = normalize_text(text)
+            conditions.append((lambda task: needle in normalize_text(task.title) or needle in normalize_text(task.description), None, ()))
+        predicate = lambda task: all(condition(task) for condition, where, params in conditions)
+        order_by = [field for field in order_by if field.lstrip('-') in TASK_SORT_KEYS]
+        ordered = False
+        if not self.loaded and hasattr(self.storage, 'iter_query'):
+            wheres = [where for condition, where, params in conditions if where]
+            records = self.iter(
+                predicate,
+                ' AND '.join(wheres) or None,
+                tuple(param for condition, where, params in conditions if where for param in params)
+            )
+        else:
+            self.refresh()
+            candidates, ordered = self._candidates(done, priority, due_from, due_to)
+            ordered = ordered and order_by in (['due'], ['due', 'priority'])
+            if not ordered:
+                candidates.sort()
+            if INSTRUMENTATION.enabled:
+                INSTRUMENTATION.count(records=len(candidates))
+            records = (self.records[record_id] for record_id in candidates if predicate(self.records[record_id]))
+        if order_by and not ordered:
+            records = sort_records(records, order_by, TASK_SORT_KEYS, None if limit is None else offset + limit)
+        return itertools.islice(records, offset, None if limit is None else offset + limit)
+
+    def _candidates(self, done, priority, due_from, due_to):
+        options = [(len(self.records), False, lambda: list(self.records))]
+        if done is not None:
+            options.append((len(self.statuses.get(done)), False, lambda: list(self.statuses.get(done))))
+        if priority is not None:
+            options.append((len(self.priorities.get(priority)), False, lambda: list(self.priorities.get(priority))))
+        if done is False:
+            ids = self.schedule.between(due_from, due_to)
+            options.append((len(ids), True, lambda: ids))
+        size, ordered, candidates = min(options, key=lambda option: option[0])
+        return candidates(), ordered
+
+    def overdue(self, today_key):
+        self.refresh()
+        return self._tasks(self.schedule.between(end_key=today_key - 1))
+
+    def due_between(self, start_key, end_key):
+        self.refresh()
+        return self._tasks(self.schedule.between(start_key, end_key))
+
+    def most_urgent(self, count):
+        self.refresh()
+        return self._tasks(self.schedule.top(count))
+
+    def _tasks(self, ids):
+        return [self.records[record_id] for record_id in ids]
+
+TASKS = TasksRepository(TASKS_STORAGE)
+def normalize_text(text):
+    return text.lower().replace('ё', 'е')
+
+def normalize_phone(phone):
+    digits = re.sub(r'\D', '', phone)
+    if len(digits) == 11 and digits.startswith('8'):
+        return '7' + digits[1:]
+    if len(digits) == 10 and digits.startswith('9'):
+        return '7' + digits
+    return digits
+
+class NgramIndex:
+    def __init__(self, size=3):
+        self.size = size
+        self.texts = {}
+        self.grams = {}
+
+    def add(self, record_id, text):
+        self.remove(record_id)
+        self.texts[record_id] = text
+        for gram in self._grams(text):
+            self.grams.setdefault(gram, set()).add(record_id)
+
+    def remove(self, record_id):
+        text = self.texts.pop(record_id, None)
+        if text is None:
+            return
+        for gram in self._grams(text):
+            ids = self.grams[gram]
+            ids.discard(record_id)
+            if not ids:
+                del self.grams[gram]
+
+    def search(self, query):
+        if len(query) < self.size:
+            return {record_id for record_id, text in self.texts.items() if query in text}
+        candidates = None
+        for gram in sorted(self._grams(query), key=lambda gram: len(self.grams.get(gram, ()))):
+            ids = self.grams.get(gram, set())
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return set()
+        if len(query) == self.size:
+            return candidates
+        return {record_id for record_id in candidates if query in self.texts[record_id]}
+
+    def _grams(self, text):
+        return {text[start:start + self.size] for start in range(len(text) - self.size + 1)}
+
+class ContactsIndex:
+    def __init__(self):
+        self.rebuild([])
+
+    def rebuild(self, records):
+        self.source = records
+        self.built = False
+
+    def warm(self):
+        if not self.built:
+            self.build()
+
+    def build(self):
+        self.names = NgramIndex()
+        self.phones = NgramIndex()
+        self.emails = NgramIndex()
+        self.built = True
+        for record in self.source:
+            self.add(record)
+
+    def index_keys(self, record):
+        return normalize_text(record.name), normalize_phone(record.phone), record.email.lower()
+
+    def add(self, record, keys=None):
+        if not self.built:
+            return
+        name, phone, email = self.index_keys(record) if keys is None else keys
+        self.names.add(record.id, name)
+        self.phones.add(record.id, phone)
+        self.emails.add(record.id, email)
+
+    def remove(self, record_id):
+        if not self.built:
+            return
+        self.names.remove(record_id)
+        self.phones.remove(record_id)
+        self.emails.remove(record_id)
+
+    def search(self, query):
+        if not self.built:
+            self.build()
+        text = normalize_text(query)
+        found = self.names.search(text) | self.emails.search(text)
+        digits = re.sub(r'\D', '', query)
+        if digits and not re.search(r'[^\d\s()+-]', query):
+            found |= self.phones.search(digits)
+            if digits.startswith('8'):
+                trunk = '7' + digits[1:]
+                found |= {record_id for record_id in self.phones.search(trunk) if self.phones.texts[record_id].startswith(trunk)}
+        return found
+
+class ContactsRepository(Repository):
+    def __init__(self, storage):
+        self.index = ContactsIndex()
+        super().__init__(storage, Contact, [self.index])
+
+    def search(self, query):
+        self.refresh()
+        text = normalize_text(query)
+        contacts = [self.records[record_id] for record_id in self.index.search(query)]
+        return sorted(contacts, key=lambda contact: (not normalize_text(contact.name).startswith(text), normalize_text(contact.name), contact.id))
+
+CONTACTS = ContactsRepository(CONTACTS_STORAGE)
+FINANCE = FinanceRepository(FINANCE_STORAGE)
+
+for repository in (NOTES, TASKS, CONTACTS, FINANCE):
+    atexit.register(repository.persist_indexes)
+
+SYNC_ENTITIES = (
+    ("Заметки", NOTES_FILE, NOTES, Note),
+    ("Задачи", TASKS_FILE, TASKS, Task),
+    ("Контакты", CONTACTS_FILE, CONTACTS, Contact),
+    ("Финансы", FINANCE_FILE, FINANCE, FinanceRecord),
+)
+
+DEDUPE_SECTIONS = {
+    'notes': ("Заметки", NOTES, True),
+    'tasks': ("Задачи", TASKS, True),
+    'contacts': ("Контакты", CONTACTS, True),
+    'finance': ("Финансы", FINANCE, False),
+}
+
+def parse_id(value):
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+def require_date(value):
+    if date_key(value) is None:
+        raise ValueError(f"некорректная дата '{value}', используйте ДД-ММ-ГГГГ")
+    return to_iso(value)
+
+def ask(value, prompt):
+    if value is not None:
+        return str(value)
+    return input(prompt)
+
+@instrumented
+def import_csv(repository, from_row, filename=None):
+    filename = ask(filename, "Введите имя CSV-файла для импорта: ")
+    imported = 0
+    skipped = 0
+    duplicates = 0
+    matched = set()
+    batch = {}
+    try:
+        with open(filename, 'r', newline='', encoding='utf-8') as csvfile:
+            reader = csv.DictReader(csvfile)
+            repository.refresh()
+            for row in reader:
+                try:
+                    if None in row.values():
+                        raise ValueError("не хватает значений")
+                    record = from_row(row)
+                    originals = repository.fingerprints.find(record)
+                except KeyError as e:
+                    print(f"Строка {reader.line_num}: отсутствует поле {e}, пропущена.")
+                    skipped += 1
+                    continue
+                except (TypeError, ValueError) as e:
+                    print(f"Строка {reader.line_num}: {e}, пропущена.")
+                    skipped += 1
+                    continue
+                original = next((record_id for record_id in originals if record_id not in matched), None)
+                if original is not None:
+                    matched.add(original)
+                    duplicates += 1
+                    continue
+                while record.id is None or record.id in batch or repository.exists(record.id):
+                    record.id = repository.allocate_id()
+                batch[record.id] = record
+                matched.add(record.id)
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    repository.add_many(list(batch.values()))
+                    imported += len(batch)
+                    batch = {}
+            repository.add_many(list(batch.values()))
+            imported += len(batch)
+            batch = {}
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        print(f"Ошибка при импорте: {e}")
+    print(f"Импорт завершен: добавлено записей {imported}, дубликатов {duplicates}, пропущено строк {skipped}.")
+
+def read_date_range(start=None, end=None):
+    start = ask(start, "Введите начальную дату (ДД-ММ-ГГГГ) или оставьте пустой: ").strip()
+    end = ask(end, "Введите конечную дату (ДД-ММ-ГГГГ) или оставьте пустой: ").strip()
+    start_key = date_key(start) if start else None
+    end_key = date_key(end) if end else None
+    if (start and start_key is None) or (end and end_key is None):
+        raise ValueError("Некорректный формат даты. Используйте ДД-ММ-ГГГГ.")
+    return start_key, end_key
+
+def in_date_range(value, start_key, end_key):
+    key = date_key(value)
+    return key is not None and (start_key is None or key >= start_key) and (end_key is None or key <= end_key)
+
+def date_conditions(get_date, column, start_key, end_key):
+    if start_key is None and end_key is None:
+        return []
+    where = None
+    if column:
+        where = ' AND '.join([f'{column} >= ?'] * (start_key is not None) + [f'{column} <= ?'] * (end_key is not None))
+    params = tuple(key for key in (start_key, end_key) if key is not None)
+    return [(lambda record: in_date_range(get_date(record), start_key, end_key), where, params)]
+
+def open_export_file(filename):
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'wt', newline='', encoding='utf-8')
+    return open(filename, 'w', newline='', encoding='utf-8')
+
+@instrumented
+def export_records(repository, fieldnames, conditions, filename=None):
+    filename = ask(filename, "Введите имя файла для экспорта (.csv или .jsonl, можно с .gz): ")
+    wheres = [where for predicate, where, params in conditions]
+    records = repository.iter(
+        lambda record: all(predicate(record) for predicate, where, params in conditions),
+        ' AND '.join(wheres) if wheres and all(wheres) else None,
+        tuple(param for predicate, where, params in conditions for param in params)
+    )
+    count = 0
+    try:
+        with open_export_file(filename) as file:
+            if filename.removesuffix('.gz').endswith('.jsonl'):
+                write_rows = lambda rows: file.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+            else:
+                writer = csv.DictWriter(file, fieldnames=fieldnames, extrasaction='ignore')
+                writer.writeheader()
+                write_rows = writer.writerows
+            while True:
+                chunk = list(itertools.islice(records, EXPORT_CHUNK_SIZE))
+                if not chunk:
+                    break
+                write_rows(record.to_dict() for record in chunk)
+                count += len(chunk)
+    except OSError as e:
+        print(f"Ошибка при экспорте: {e}")
+        return
+    print(f"Экспорт завершен успешно. Выгружено записей: {count}.")
+
+def migrate_legacy_files():
+    for storage in STORAGES:
+        if not isinstance(storage, JsonFileStorage) and storage.migrate():
+            print(f"Данные из {storage.legacy_file} перенесены в хранилище {STORAGE_BACKEND}.")
+
+def migrate_dates(directory=''):
+    marker = os.path.join(directory, DATES_MIGRATED_FILE)
+    migrated = []
+    if os.path.exists(marker):
+        with open(marker, 'r', encoding='utf-8') as file:
+            migrated = file.read().split()
+    if STORAGE_BACKEND in migrated:
+        return
+    for title, name, storage, field in DATE_FIELDS:
+        if directory:
+            storage = make_storage(name, directory)
+        with storage.lock:
+            records = storage.load()
+            changed = 0
+            for data in records:
+                value = to_iso(data[field])
+                if value != data[field]:
+                    data[field] = value
+                    changed += 1
+            if changed:
+                storage.save(records)
+                print(f"{title}{f' ({directory})' if directory else ''}: даты {changed} записей переведены в формат ГГГГ-ММ-ДД.")
+    with atomic_file(marker) as file:
+        file.write('\n'.join(migrated + [STORAGE_BACKEND]) + '\n')
+
+def sync_states(repository):
+    repository.refresh()
+    states = {record_id: (version, modified, True) for record_id, (version, modified) in repository.tombstones.load().items()}
+    for record in repository.records.values():
+        state = (record.version, record.modified, False)
+        states[record.id] = max(state, states.get(record.id, state))
+    return states
+
+def sync_key(repository, record_id, state):
+    if state[2]:
+        return state + ('',)
+    data = repository.records[record_id].to_dict()
+    for title, name, storage, field in DATE_FIELDS:
+        if field in data:
+            data[field] = to_iso(data[field])
+    return state + (json.dumps(data, ensure_ascii=False, sort_keys=True),)
+
+def plan_sync(local, remote, base):
+    local_states, remote_states = sync_states(local), sync_states(remote)
+    plan = {'local': ([], []), 'remote': ([], []), 'conflicts': 0, 'renumbered': []}
+    sides = {'local': (local, local_states), 'remote': (remote, remote_states)}
+    for record_id in sorted(set(local_states) | set(remote_states)):
+        a, b = local_states.get(record_id), remote_states.get(record_id)
+        if a == b and (a[0] or a[2] or sync_key(local, record_id, a) == sync_key(remote, record_id, b)):
+            continue
+        known = base.get(record_id)
+        if a is None or b is None:
+            winner = 'remote' if a is None else 'local'
+        elif known is None and a[2] != b[2]:
+            winner = 'remote' if a[2] else 'local'
+        elif a != known and b != known:
+            plan['conflicts'] += 1
+            winner = 'local' if sync_key(local, record_id, a) > sync_key(remote, record_id, b) else 'remote'
+            if known is None and not a[2] and not b[2]:
+                loser = 'remote' if winner == 'local' else 'local'
+                plan['renumbered'].append(sides[loser][0].records[record_id])
+        else:
+            winner = 'local' if a != known else 'remote'
+        repository, states = sides[winner]
+        target = plan['remote' if winner == 'local' else 'local']
+        if states[record_id][2]:
+            target[1].append((record_id,) + states[record_id][:2])
+        else:
+            target[0].append(repository.records[record_id])
+    return plan
+
+def apply_sync(local, remote, plan):
+    for record in plan['renumbered']:
+        new_id = max(local.allocate_id(), remote.allocate_id())
+        for repository in (local, remote):
+            repository.storage.next_id = max(repository.storage.next_id, new_id + 1)
+        copy = local.record_class.from_dict(dict(record.to_dict(), id=new_id))
+        plan['local'][0].append(copy)
+        plan['remote'][0].append(copy)
+    for repository, (records, tombstones) in ((local, plan['local']), (remote, plan['remote'])):
+        with repository.storage.lock:
+            repository.add_many(records, touch=False)
+            repository.tombstones.discard([record.id for record in records])
+            for record_id, version, modified in tombstones:
+                repository.remove(record_id, version, modified)
+
+def read_sync_state(directory):
+    filename = os.path.join(directory, SYNC_FILE)
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def write_sync_state(directory, peer, manifests):
+    state = read_sync_state(directory)
+    state[os.path.abspath(peer)] = manifests
+    with atomic_file(os.path.join(directory, SYNC_FILE)) as file:
+        json.dump(state, file, ensure_ascii=False)
 
-class Contact:
-    def __init__(self, id, name, phone, email):
-        self.id = id
-        self.name = name
-        self.phone = phone
-        self.email = email
+@instrumented
+def sync_directories(directory, dry_run=False):
+    if not os.path.isdir(directory):
+        print(f"Папка {directory} не найдена.")
+        return
+    if os.path.abspath(directory) == os.path.abspath('.'):
+        print("Нельзя синхронизировать папку саму с собой.")
+        return
+    base = read_sync_state('.').get(os.path.abspath(directory), {})
+    if not dry_run:
+        migrate_dates(directory)
+    manifests = {}
+    for title, name, local, record_class in SYNC_ENTITIES:
+        remote = Repository(make_storage(name, directory), record_class)
+        with local.storage.lock, remote.storage.lock:
+            known = {record_id: (version, modified, deleted) for record_id, version, modified, deleted in base.get(name, [])}
+            plan = plan_sync(local, remote, known)
+            if not dry_run:
+                apply_sync(local, remote, plan)
+                manifests[name] = [[record_id, *state] for record_id, state in sorted(sync_states(local).items())]
+            print(f"{title}: получено {len(plan['local'][0]) + len(plan['local'][1])}, "
+                  f"отправлено {len(plan['remote'][0]) + len(plan['remote'][1])}, "
+                  f"конфликтов {plan['conflicts']}, перенумеровано {len(plan['renumbered'])}")
+    if not dry_run:
+        write_sync_state('.', directory, manifests)
+        write_sync_state(directory, '.', manifests)
+        print("Синхронизация завершена.")
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'phone': self.phone,
-            'email': self.email
-        }
+def merge_group(repository, ids):
+    records = [repository.checkout(record_id) for record_id in ids]
+    kept = records[0]
+    for field in kept.FIELDS:
+        if field in ('id', 'version', 'modified') or getattr(kept, field) not in ('', None, False):
+            continue
+        for other in records[1:]:
+            if getattr(other, field) not in ('', None, False):
+                setattr(kept, field, getattr(other, field))
+                break
+    repository.update(kept)
+    for record in records[1:]:
+        repository.remove(record.id)
 
-    @staticmethod
-    def from_dict(data):
-        return Contact(
-            id=data['id'],
-            name=data['name'],
-            phone=data['phone'],
-            email=data['email']
-        )
+@instrumented
+def merge_duplicates(section=None, dry_run=False, force=False):
+    merged = False
+    for name, (title, repository, merge) in DEDUPE_SECTIONS.items():
+        if section and name != section:
+            continue
+        repository.refresh()
+        groups = repository.fingerprints.groups()
+        print(f"{title}: групп дубликатов {len(groups)}, лишних записей {sum(len(group) - 1 for group in groups)}")
+        report_only = dry_run or not (merge or force)
+        if groups and report_only and not dry_run:
+            print("  Одинаковые записи могут быть разными операциями, они не объединены. Используйте --force, чтобы объединить.")
+        for group in groups:
+            if report_only:
+                print(f"  ID {group[0]}: дубликаты {', '.join(map(str, group[1:]))}")
+                continue
+            try:
+                merge_group(repository, group)
+                merged = True
+            except ConflictError as e:
+                print(f"  ID {group[0]}: {e}")
+    if merged:
+        print("Дубликаты объединены.")
 
-class FinanceRecord:
-    def __init__(self, id, amount, category, date, description):
-        self.id = id
-        self.amount = amount
-        self.category = category
-        self.date = date
-        self.description = description
+def convert_storage(format):
+    if format not in STORAGE_FORMATS:
+        print(f"Неизвестный формат: {format}. Доступны: {', '.join(STORAGE_FORMATS)}.")
+        return
+    for storage in STORAGES:
+        if isinstance(storage, SqliteStorage):
+            print("Хранилище SQLite не использует файловые форматы.")
+            return
+        with storage.lock:
+            records = storage.load()
+            storage.choose_format(format)
+            storage.save(records)
+        print(f"{storage.files()[0]}: {len(records)} записей сохранено в формате {format}.")
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'amount': self.amount,
-            'category': self.category,
-            'date': self.date,
-            'description': self.description
-        }
+def measure_formats():
+    for name, repository in (('Заметки', NOTES), ('Задачи', TASKS), ('Контакты', CONTACTS), ('Финансы', FINANCE)):
+        records = [record.to_dict() for record in repository.all()]
+        if not records:
+            continue
+        print(f"\n{name}: {len(records)} записей")
+        for format in STORAGE_FORMATS:
+            start = time.perf_counter()
+            data = encode_payload(records, format)
+            save_time = time.perf_counter() - start
+            start = time.perf_counter()
+            decode_payload(data)
+            load_time = time.perf_counter() - start
+            print(f"{format}: {len(data) / 1024 / 1024:.2f} МБ, запись {save_time * 1000:.0f} мс ({len(records) / save_time:.0f} зап/с), чтение {load_time * 1000:.0f} мс ({len(records) / load_time:.0f} зап/с)")
 
-    @staticmethod
-    def from_dict(data):
-        return FinanceRecord(
-            id=data['id'],
-            amount=data['amount'],
-            category=data['category'],
-            date=data['date'],
-            description=data['description']
-        )
+SAMPLE_ROWS = {
+    Note: ('Список покупок', 'Молоко, хлеб, яйца', '2025-01-01 10:00:00', 1, '2025-01-01T10:00:00.000000Z'),
+    Task: ('Подготовить отчёт', 'Квартальный отчёт для бухгалтерии', False, 'Высокий', '2025-03-15', 1, '2025-01-01T10:00:00.000000Z'),
+    Contact: ('Иван Петров', '+7 999 123-45-67', 'ivan@example.com', 1, '2025-01-01T10:00:00.000000Z'),
+    FinanceRecord: (-1250.5, 'Продукты', '2025-02-03', 'Покупка в магазине', 1, '2025-01-01T10:00:00.000000Z'),
+}
+
+class PlainRecord:
+    pass
+
+def plain_record(fields, row):
+    record = PlainRecord()
+    record.__dict__.update(zip(fields, row))
+    return record
+
+def measure_records(count):
+    for record_class, sample in SAMPLE_ROWS.items():
+        rows = [(record_id,) + sample for record_id in range(count)]
+        print(f"\n{record_class.__name__}: {count} записей")
+        results = {}
+        for name, build in (
+            ('dict', lambda row: dict(zip(record_class.FIELDS, row))),
+            ('__dict__', lambda row: plain_record(record_class.FIELDS, row)),
+            ('__slots__', record_class.from_row),
+        ):
+            tracemalloc.start()
+            start = time.perf_counter()
+            records = list(map(build, rows))
+            elapsed = time.perf_counter() - start
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            results[name] = size
+            print(f"{name}: {size / 1024 / 1024:.1f} МБ, {count / elapsed:.0f} зап/с")
+            del records
+        print(f"Экономия памяти __slots__ относительно __dict__: {1 - results['__slots__'] / results['__dict__']:.0%}")
+        dicts = [dict(zip(record_class.FIELDS, row)) for row in rows]
+        start = time.perf_counter()
+        decoded = list(map(record_class.from_dict, dicts))
+        dict_time = time.perf_counter() - start
+        start = time.perf_counter()
+        list(map(record_class.from_row, rows))
+        row_time = time.perf_counter() - start
+        start = time.perf_counter()
+        [record.to_dict() for record in decoded]
+        encode_dict_time = time.perf_counter() - start
+        start = time.perf_counter()
+        [record.to_row() for record in decoded]
+        encode_row_time = time.perf_counter() - start
+        print(f"Чтение: from_dict {count / dict_time:.0f} зап/с, from_row {count / row_time:.0f} зап/с")
+        print(f"Запись: to_dict {count / encode_dict_time:.0f} зап/с, to_row {count / encode_row_time:.0f} зап/с")
 
 def main_menu():
     while True:
@@ -149,9 +2581,10 @@ def notes_menu():
         print("3. Посмотреть подробности заметки")
         print("4. Редактировать заметку")
         print("5. Удалить заметку")
-        print("6. Импорт заметок из CSV")
-        print("7. Экспорт заметок в CSV")
-        print("8. Назад в главное меню")
+        print("6. Поиск заметок")
+        print("7. Импорт заметок из CSV")
+        print("8. Экспорт заметок (CSV/JSONL)")
+        print("9. Назад в главное меню")
 
         choice = input("Выберите действие: ")
         if choice == '1':
@@ -165,117 +2598,146 @@ def notes_menu():
         elif choice == '5':
             delete_note()
         elif choice == '6':
-            import_notes_csv()
+            search_notes()
         elif choice == '7':
-            export_notes_csv()
+            import_notes_csv()
         elif choice == '8':
+            export_notes_csv()
+        elif choice == '9':
             break
         else:
-            print("Неверный ввод. Введите целое число от 1 до 8")
+            print("Неверный ввод. Введите целое число от 1 до 9")
 
+@instrumented
 def load_notes():
-    if not os.path.exists(NOTES_FILE):
-        return []
-    with open(NOTES_FILE, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-        return [Note.from_dict(note) for note in data]
+    return NOTES.all()
 
+@instrumented
 def save_notes(notes):
-    with open(NOTES_FILE, 'w', encoding='utf-8') as file:
-        json.dump([note.to_dict() for note in notes], file, ensure_ascii=False, indent=4)
+    NOTES.replace_all(notes)
 
-def create_note():
-    notes = load_notes()
-    note_id = max([note.id for note in notes], default=0) + 1
-    title = input("Введите заголовок заметки: ").strip()
+@instrumented
+def create_note(title=None, content=None):
+    title = ask(title, "Введите заголовок заметки: ").strip()
     if not title:
         print("Заголовок не может быть пустым.")
         return
-    content = input("Введите содержимое заметки: ")
-    timestamp = datetime.now().strftime('%d-%m-%Y %H:%M:%S')
-    note = Note(id=note_id, title=title, content=content, timestamp=timestamp)
-    notes.append(note)
-    save_notes(notes)
+    content = ask(content, "Введите содержимое заметки: ")
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    note = Note(id=NOTES.allocate_id(), title=title, content=content, timestamp=timestamp)
+    NOTES.add(note)
     print("Заметка успешно создана.")
 
-def list_notes():
-    notes = load_notes()
-    if not notes:
-        print("Список заметок пуст.")
-        return
-    print("\nСписок заметок:")
-    for note in notes:
-        print(f"ID: {note.id}, Заголовок: {note.title}, Дата: {note.timestamp}")
-
-def view_note():
-    note_id = input("Введите ID заметки для просмотра: ")
-    notes = load_notes()
-    for note in notes:
-        if str(note.id) == note_id:
-            print(f"\nЗаголовок: {note.title}")
-            print(f"Содержимое: {note.content}")
-            print(f"Дата: {note.timestamp}")
+def browse(repository, title, empty, render, cursor=None, page_size=PAGE_SIZE, newest_first=True, interactive=True):
+    cursors = [cursor]
+    while True:
+        records, next_cursor = repository.page(cursors[-1], page_size or None, newest_first)
+        if not records and len(cursors) == 1:
+            print(empty)
             return
-    print("Заметка не найдена.")
-
-def edit_note():
-    note_id = input("Введите ID заметки для редактирования: ")
-    notes = load_notes()
-    for note in notes:
-        if str(note.id) == note_id:
-            title = input(f"Введите новый заголовок (текущий: {note.title}): ").strip()
-            if not title:
-                print("Заголовок не может быть пустым.")
-                return
-            content = input("Введите новое содержимое: ")
-            timestamp = datetime.now().strftime('%d-%m-%Y %H:%M:%S')
-            note.title = title
-            note.content = content
-            note.timestamp = timestamp
-            save_notes(notes)
-            print("Заметка успешно обновлена.")
+        print(f"\n{title}" + (f" (страница {len(cursors)})" if page_size else '') + ':')
+        for record in records:
+            render(record)
+        if not interactive:
+            if next_cursor is not None:
+                print(f"Следующая страница: --cursor {next_cursor}")
+            return
+        if next_cursor is None and len(cursors) == 1:
+            return
+        choice = input("[n] следующая, [p] предыдущая, Enter — выход: ").strip().lower()
+        if choice == 'n' and next_cursor is not None:
+            cursors.append(next_cursor)
+        elif choice == 'p' and len(cursors) > 1:
+            cursors.pop()
+        elif choice not in ('n', 'p'):
             return
-    print("Заметка не найдена.")
 
-def delete_note():
-    note_id = input("Введите ID заметки для удаления: ")
-    notes = load_notes()
-    notes = [note for note in notes if str(note.id) != note_id]
-    save_notes(notes)
-    print("\nЗаметка успешно удалена.")
+def print_note(note):
+    print(f"ID: {note.id}, Заголовок: {note.title}, Дата: {display_date(note.timestamp)}")
 
-def import_notes_csv():
-    filename = input("Введите имя CSV-файла для импорта: ")
+@instrumented
+def list_notes(cursor=None, page_size=PAGE_SIZE, newest_first=True, interactive=True):
+    browse(NOTES, "Список заметок", "Список заметок пуст.", print_note, cursor, page_size, newest_first, interactive)
+
+@instrumented
+def view_note(note_id=None):
+    note_id = ask(note_id, "Введите ID заметки для просмотра: ")
+    note = NOTES.get(parse_id(note_id))
+    if not note:
+        print("Заметка не найдена.")
+        return
+    print(f"\nЗаголовок: {note.title}")
+    print(f"Содержимое: {note.content}")
+    print(f"Дата: {display_date(note.timestamp)}")
+
+@instrumented
+def edit_note(note_id=None, title=None, content=None):
+    note_id = ask(note_id, "Введите ID заметки для редактирования: ")
+    note = NOTES.checkout(parse_id(note_id))
+    if not note:
+        print("Заметка не найдена.")
+        return
+    title = ask(title, f"Введите новый заголовок (текущий: {note.title}): ").strip()
+    if not title:
+        print("Заголовок не может быть пустым.")
+        return
+    content = ask(content, "Введите новое содержимое: ")
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    note.title = title
+    note.content = content
+    note.timestamp = timestamp
     try:
-        with open(filename, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            notes = load_notes()
-            for row in reader:
-                note = Note(
-                    id=int(row['id']),
-                    title=row['title'],
-                    content=row['content'],
-                    timestamp=row['timestamp']
-                )
-                notes.append(note)
-            save_notes(notes)
-            print("Импорт завершен успешно.")
-    except Exception as e:
-        print(f"Ошибка при импорте: {e}")
+        NOTES.update(note)
+    except ConflictError as e:
+        print(e)
+        return
+    print("Заметка успешно обновлена.")
+
+@instrumented
+def delete_note(note_id=None):
+    note_id = ask(note_id, "Введите ID заметки для удаления: ")
+    if not NOTES.remove(parse_id(note_id)):
+        print("Заметка не найдена.")
+        return
+    print("\nЗаметка успешно удалена.")
+
+@instrumented
+def search_notes(query=None):
+    query = ask(query, "Введите слова для поиска: ").strip()
+    if not query:
+        print("Запрос не может быть пустым.")
+        return
+    results = NOTES.search(query)
+    if not results:
+        print("Заметки не найдены.")
+        return
+    print("\nНайденные заметки:")
+    for note, score in results:
+        print(f"ID: {note.id}, Заголовок: {note.title}, Дата: {display_date(note.timestamp)}, Совпадений: {score}")
+
+def note_from_row(row):
+    return Note(
+        id=parse_id(row.get('id') or ''),
+        title=row['title'],
+        content=row['content'],
+        timestamp=to_iso(row['timestamp'])
+    )
 
-def export_notes_csv():
-    filename = input("Введите имя CSV-файла для экспорта: ")
-    notes = load_notes()
-    if not notes:
+@instrumented
+def import_notes_csv(filename=None):
+    import_csv(NOTES, note_from_row, filename)
+
+@instrumented
+def export_notes_csv(filename=None, start=None, end=None):
+    if not NOTES.count():
         print("Нет заметок для экспорта.")
         return
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['id', 'title', 'content', 'timestamp']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for note in notes:
-            writer.writerow(note.to_dict())
-    print("Экспорт завершен успешно.")
+    try:
+        conditions = date_conditions(lambda note: note.timestamp[:10], None, *read_date_range(start, end))
+    except ValueError as e:
+        print(e)
+        return
+    export_records(NOTES, ['id', 'title', 'content', 'timestamp'], conditions, filename)
 
 def tasks_menu():
     while True:
@@ -286,9 +2748,10 @@ def tasks_menu():
         print("4. Редактировать задачу")
         print("5. Удалить задачу")
         print("6. Импорт задач из CSV")
-        print("7. Экспорт задач в CSV")
+        print("7. Экспорт задач (CSV/JSONL)")
         print("8. Фильтрация задач")
-        print("9. Назад в главное меню")
+        print("9. Расписание задач")
+        print("10. Назад в главное меню")
 
         choice = input("Выберите действие: ")
         if choice == '1':
@@ -308,164 +2771,221 @@ def tasks_menu():
         elif choice == '8':
             filter_tasks()
         elif choice == '9':
+            task_schedule()
+        elif choice == '10':
             break
         else:
-            print("Неверный ввод. Введите целое число от 1 до 9")
+            print("Неверный ввод. Введите целое число от 1 до 10")
 
+@instrumented
 def load_tasks():
-    if not os.path.exists(TASKS_FILE):
-        return []
-    with open(TASKS_FILE, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-        return [Task.from_dict(task) for task in data]
+    return TASKS.all()
 
+@instrumented
 def save_tasks(tasks):
-    with open(TASKS_FILE, 'w', encoding='utf-8') as file:
-        json.dump([task.to_dict() for task in tasks], file, ensure_ascii=False, indent=4)
+    TASKS.replace_all(tasks)
 
-def create_task():
-    tasks = load_tasks()
-    task_id = max([task.id for task in tasks], default=0) + 1
-    title = input("Введите название задачи: ").strip()
+@instrumented
+def create_task(title=None, description=None, priority=None, due_date=None):
+    title = ask(title, "Введите название задачи: ").strip()
     if not title:
         print("Описание задачи не может быть пустым.")
         return
-    description = input("Введите подробное описание задачи: ")
-    priority = input("Установите приоритет задачи (Высокий/Средний/Низкий): ")
+    description = ask(description, "Введите подробное описание задачи: ")
+    priority = ask(priority, "Установите приоритет задачи (Высокий/Средний/Низкий): ")
     if priority not in ['Высокий', 'Средний', 'Низкий']:
         print("Некорректный приоритет. Установлен приоритет по умолчанию: Средний.")
         priority = 'Средний'
-    due_date = input("Введите срок выполнения задачи (ДД-ММ-ГГГГ): ")
+    due_date = ask(due_date, "Введите срок выполнения задачи (ДД-ММ-ГГГГ): ")
     try:
-        datetime.strptime(due_date, '%d-%m-%Y')
+        due_date = require_date(due_date)
     except ValueError:
         print("Некорректный формат даты. Используйте ДД-ММ-ГГГГ.")
         return
-    task = Task(id=task_id, title=title, description=description, done=False, priority=priority, due_date=due_date)
-    tasks.append(task)
-    save_tasks(tasks)
+    task = Task(id=TASKS.allocate_id(), title=title, description=description, done=False, priority=priority, due_date=due_date)
+    TASKS.add(task)
     print("Задача успешно создана.")
 
-def list_tasks():
-    tasks = load_tasks()
-    if not tasks:
-        print("Список задач пуст.")
-        return
-    print("\nСписок задач:")
-    for task in tasks:
-        status = 'Выполнена' if task.done else 'Не выполнена'
-        print(f"ID: {task.id}, Описание: {task.title}, Статус: {status}, Приоритет: {task.priority}, Срок: {task.due_date}")
+@instrumented
+def list_tasks(cursor=None, page_size=PAGE_SIZE, newest_first=True, interactive=True):
+    browse(TASKS, "Список задач", "Список задач пуст.", print_task, cursor, page_size, newest_first, interactive)
 
-def mark_task_done():
-    task_id = input("Введите ID задачи для отметки как выполненной: ")
-    tasks = load_tasks()
-    for task in tasks:
-        if str(task.id) == task_id:
-            task.done = True
-            save_tasks(tasks)
-            print("Задача отмечена как выполненная.")
-            return
-    print("Задача не найдена.")
+def print_task(task):
+    status = 'Выполнена' if task.done else 'Не выполнена'
+    print(f"ID: {task.id}, Описание: {task.title}, Статус: {status}, Приоритет: {task.priority}, Срок: {display_date(task.due_date)}")
 
-def edit_task():
-    task_id = input("Введите ID задачи для редактирования: ")
-    tasks = load_tasks()
+def print_tasks(tasks):
     for task in tasks:
-        if str(task.id) == task_id:
-            title = input(f"Введите новое название (текущее: {task.title}): ")
-            if not title:
-                print("Описание задачи не может быть пустым.")
-                return
-            description = input("Введите новое подробное описание: ")
-            priority = input(f"Установите новый приоритет (текущий: {task.priority}): ")
-            if priority not in ['Высокий', 'Средний', 'Низкий']:
-                print("Некорректный приоритет. Приоритет не изменен.")
-            else:
-                task.priority = priority
-            due_date = input(f"Введите новый срок выполнения (текущий: {task.due_date}): ")
-            try:
-                datetime.strptime(due_date, '%d-%m-%Y')
-                task.due_date = due_date
-            except ValueError:
-                print("Некорректный формат даты. Срок выполнения не изменен.")
-            task.title = title
-            task.description = description
-            save_tasks(tasks)
-            print("Задача успешно обновлена.")
-            return
-    print("Задача с введённым ID не найдена.")
+        print_task(task)
 
-def delete_task():
-    task_id = input("Введите ID задачи для удаления: ")
-    tasks = load_tasks()
-    tasks = [task for task in tasks if str(task.id) != task_id]
-    save_tasks(tasks)
-    print("Задача успешно удалена.")
+@instrumented
+def mark_task_done(task_id=None):
+    task_id = ask(task_id, "Введите ID задачи для отметки как выполненной: ")
+    task = TASKS.checkout(parse_id(task_id))
+    if not task:
+        print("Задача не найдена.")
+        return
+    task.done = True
+    try:
+        TASKS.update(task)
+    except ConflictError as e:
+        print(e)
+        return
+    print("Задача отмечена как выполненная.")
 
-def import_tasks_csv():
-    filename = input("Введите имя CSV-файла для импорта: ")
+@instrumented
+def edit_task(task_id=None, title=None, description=None, priority=None, due_date=None):
+    task_id = ask(task_id, "Введите ID задачи для редактирования: ")
+    task = TASKS.checkout(parse_id(task_id))
+    if not task:
+        print("Задача с введённым ID не найдена.")
+        return
+    title = ask(title, f"Введите новое название (текущее: {task.title}): ")
+    if not title:
+        print("Описание задачи не может быть пустым.")
+        return
+    description = ask(description, "Введите новое подробное описание: ")
+    priority = ask(priority, f"Установите новый приоритет (текущий: {task.priority}): ")
+    if priority not in ['Высокий', 'Средний', 'Низкий']:
+        print("Некорректный приоритет. Приоритет не изменен.")
+    else:
+        task.priority = priority
+    due_date = ask(due_date, f"Введите новый срок выполнения (текущий: {display_date(task.due_date)}): ")
     try:
-        with open(filename, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            tasks = load_tasks()
-            for row in reader:
-                task = Task(
-                    id=int(row['id']),
-                    title=row['title'],
-                    description=row['description'],
-                    done=row['done'] == 'True',
-                    priority=row['priority'],
-                    due_date=row['due_date']
-                )
-                tasks.append(task)
-            save_tasks(tasks)
-            print("Импорт завершен успешно.")
-    except Exception as e:
-        print(f"Ошибка при импорте: {e}")
+        task.due_date = require_date(due_date)
+    except ValueError:
+        print("Некорректный формат даты. Срок выполнения не изменен.")
+    task.title = title
+    task.description = description
+    try:
+        TASKS.update(task)
+    except ConflictError as e:
+        print(e)
+        return
+    print("Задача успешно обновлена.")
 
-def export_tasks_csv():
-    filename = input("Введите имя CSV-файла для экспорта: ")
-    tasks = load_tasks()
-    if not tasks:
+@instrumented
+def delete_task(task_id=None):
+    task_id = ask(task_id, "Введите ID задачи для удаления: ")
+    if not TASKS.remove(parse_id(task_id)):
+        print("Задача не найдена.")
+        return
+    print("Задача успешно удалена.")
+
+def task_from_row(row):
+    return Task(
+        id=parse_id(row.get('id') or ''),
+        title=row['title'],
+        description=row['description'],
+        done=row['done'] == 'True',
+        priority=row['priority'],
+        due_date=require_date(row['due_date'])
+    )
+
+@instrumented
+def import_tasks_csv(filename=None):
+    import_csv(TASKS, task_from_row, filename)
+
+@instrumented
+def export_tasks_csv(filename=None, start=None, end=None, status=None):
+    if not TASKS.count():
         print("Нет задач для экспорта.")
         return
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['id', 'title', 'description', 'done', 'priority', 'due_date']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for task in tasks:
-            writer.writerow(task.to_dict())
-    print("Экспорт завершен успешно.")
-
-def filter_tasks():
-    print("\nФильтрация задач")
-    print("1. По статусу")
-    print("2. По приоритету")
-    print("3. По сроку выполнения")
-    choice = input("Выберите фильтр: ")
-    tasks = load_tasks()
-    if not tasks:
+    try:
+        conditions = date_conditions(lambda task: task.due_date, 'due_key', *read_date_range(start, end))
+    except ValueError as e:
+        print(e)
+        return
+    status = ask(status, "Введите статус (Выполнена/Не выполнена) или оставьте пустым: ").strip()
+    if status:
+        done = status == 'Выполнена'
+        conditions.append((lambda task: task.done == done, 'done = ?', (done,)))
+    export_records(TASKS, ['id', 'title', 'description', 'done', 'priority', 'due_date'], conditions, filename)
+
+TASK_SORT_FIELDS = {'срок': 'due', 'приоритет': 'priority', 'название': 'title', 'id': 'id'}
+TASK_SORT_DIRECTIONS = {'': False, 'возр': False, 'asc': False, 'убыв': True, 'desc': True}
+
+def parse_task_order(order):
+    order_by = []
+    for field in order.replace(',', ' ').split():
+        key, _, direction = field.lstrip('-').lower().partition(':')
+        name = TASK_SORT_FIELDS.get(key)
+        if not name or direction not in TASK_SORT_DIRECTIONS:
+            raise ValueError(f"Неизвестное поле сортировки: {field}.")
+        descending = TASK_SORT_DIRECTIONS[direction] or field.startswith('-')
+        order_by.append('-' + name if descending else name)
+    return order_by
+
+@instrumented
+def filter_tasks(status=None, priority=None, start=None, end=None, text=None, order=None, limit=None, offset=None):
+    print("\nФильтрация задач (оставьте поле пустым, чтобы не фильтровать по нему)")
+    if not TASKS.count():
         print("Список задач пуст.")
         return
+    status = ask(status, "Введите статус (Выполнена/Не выполнена): ").strip()
+    priority = ask(priority, "Введите приоритет (Высокий/Средний/Низкий): ").strip()
+    try:
+        due_from, due_to = read_date_range(start, end)
+    except ValueError as e:
+        print(e)
+        return
+    text = ask(text, "Введите текст для поиска в названии или описании: ").strip()
+    order = ask(order, "Сортировка (срок, приоритет, название, id; ':убыв' после поля — по убыванию): ")
+    try:
+        order_by = parse_task_order(order)
+    except ValueError as e:
+        print(e)
+        return
+    limit = ask(limit, "Максимальное количество задач: ").strip()
+    offset = ask(offset, "Сколько задач пропустить: ").strip()
+    if not (limit.isdigit() or not limit) or not (offset.isdigit() or not offset):
+        print("Некорректное число.")
+        return
+    filtered_tasks = list(TASKS.query(
+        done=None if not status else status == 'Выполнена',
+        priority=priority or None,
+        due_from=due_from,
+        due_to=due_to,
+        text=text,
+        order_by=order_by,
+        limit=int(limit) if limit else None,
+        offset=int(offset or 0)
+    ))
+    if not filtered_tasks:
+        print("Нет задач, соответствующих критериям фильтрации.")
+        return
+    print_tasks(filtered_tasks)
+
+@instrumented
+def task_schedule(choice=None, count=None):
+    if choice is None:
+        print("\nРасписание задач")
+        print("1. Просроченные")
+        print("2. На сегодня")
+        print("3. На ближайшие дни")
+        print("4. Самые срочные")
+    choice = ask(choice, "Выберите вариант: ")
+    today_key = date.today().toordinal()
     if choice == '1':
-        status = input("Введите статус (Выполнена/Не выполнена): ")
-        status = True if status == 'Выполнена' else False
-        filtered_tasks = [task for task in tasks if task.done == status]
+        tasks = TASKS.overdue(today_key)
     elif choice == '2':
-        priority = input("Введите приоритет (Высокий/Средний/Низкий): ")
-        filtered_tasks = [task for task in tasks if task.priority == priority]
-    elif choice == '3':
-        due_date = input("Введите срок выполнения (ДД-ММ-ГГГГ): ")
-        filtered_tasks = [task for task in tasks if task.due_date == due_date]
+        tasks = TASKS.due_between(today_key, today_key)
+    elif choice in ('3', '4'):
+        count = ask(count, "Введите количество дней: " if choice == '3' else "Введите количество задач: ")
+        if not count.isdigit():
+            print("Некорректное число.")
+            return
+        if choice == '3':
+            tasks = TASKS.due_between(today_key, today_key + int(count))
+        else:
+            tasks = TASKS.most_urgent(int(count))
     else:
         print("Некорректный выбор.")
         return
-    if not filtered_tasks:
-        print("Нет задач, соответствующих критериям фильтрации.")
+    if not tasks:
+        print("Нет невыполненных задач, соответствующих выбору.")
         return
-    for task in filtered_tasks:
-        status = 'Выполнена' if task.done else 'Не выполнена'
-        print(f"ID: {task.id}, Описание: {task.title}, Статус: {status}, Приоритет: {task.priority}, Срок: {task.due_date}")
+    print_tasks(tasks)
 
 def contacts_menu():
     while True:
@@ -475,7 +2995,7 @@ def contacts_menu():
         print("3. Редактировать контакт")
         print("4. Удалить контакт")
         print("5. Импорт контактов из CSV")
-        print("6. Экспорт контактов в CSV")
+        print("6. Экспорт контактов (CSV/JSONL)")
         print("7. Назад в главное меню")
 
         choice = input("Выберите действие: ")
@@ -496,35 +3016,30 @@ def contacts_menu():
         else:
             print("Неверный ввод. Введите целое число от 1 до 7")
 
+@instrumented
 def load_contacts():
-    if not os.path.exists(CONTACTS_FILE):
-        return []
-    with open(CONTACTS_FILE, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-        return [Contact.from_dict(contact) for contact in data]
+    return CONTACTS.all()
 
+@instrumented
 def save_contacts(contacts):
-    with open(CONTACTS_FILE, 'w', encoding='utf-8') as file:
-        json.dump([contact.to_dict() for contact in contacts], file, ensure_ascii=False, indent=4)
+    CONTACTS.replace_all(contacts)
 
-def create_contact():
-    contacts = load_contacts()
-    contact_id = max([contact.id for contact in contacts], default=0) + 1
-    name = input("Введите имя контакта: ").strip()
+@instrumented
+def create_contact(name=None, phone=None, email=None):
+    name = ask(name, "Введите имя контакта: ").strip()
     if not name:
         print("Имя не может быть пустым.")
         return
-    phone = input("Введите номер телефона: ")
-    email = input("Введите адрес электронной почты: ")
-    contact = Contact(id=contact_id, name=name, phone=phone, email=email)
-    contacts.append(contact)
-    save_contacts(contacts)
+    phone = ask(phone, "Введите номер телефона: ")
+    email = ask(email, "Введите адрес электронной почты: ")
+    contact = Contact(id=CONTACTS.allocate_id(), name=name, phone=phone, email=email)
+    CONTACTS.add(contact)
     print("Контакт успешно добавлен.")
 
-def search_contact():
-    query = input("Введите имя или номер телефона для поиска: ").strip()
-    contacts = load_contacts()
-    found_contacts = [contact for contact in contacts if query.lower() in contact.name.lower() or query in contact.phone]
+@instrumented
+def search_contact(query=None):
+    query = ask(query, "Введите имя или номер телефона для поиска: ").strip()
+    found_contacts = CONTACTS.search(query)
     if not found_contacts:
         print("Контакты не найдены.")
         return
@@ -532,64 +3047,56 @@ def search_contact():
     for contact in found_contacts:
         print(f"ID: {contact.id}, Имя: {contact.name}, Телефон: {contact.phone}, Email: {contact.email}")
 
-def edit_contact():
-    contact_id = input("Введите ID контакта для редактирования: ")
-    contacts = load_contacts()
-    for contact in contacts:
-        if str(contact.id) == contact_id:
-            name = input(f"Введите новое имя (текущее: {contact.name}): ").strip()
-            if not name:
-                print("Имя не может быть пустым.")
-                return
-            phone = input(f"Введите новый телефон (текущий: {contact.phone}): ")
-            email = input(f"Введите новый email (текущий: {contact.email}): ")
-            contact.name = name
-            contact.phone = phone
-            contact.email = email
-            save_contacts(contacts)
-            print("Контакт успешно обновлен.")
-            return
-    print("Контакт не найден.")
+@instrumented
+def edit_contact(contact_id=None, name=None, phone=None, email=None):
+    contact_id = ask(contact_id, "Введите ID контакта для редактирования: ")
+    contact = CONTACTS.checkout(parse_id(contact_id))
+    if not contact:
+        print("Контакт не найден.")
+        return
+    name = ask(name, f"Введите новое имя (текущее: {contact.name}): ").strip()
+    if not name:
+        print("Имя не может быть пустым.")
+        return
+    phone = ask(phone, f"Введите новый телефон (текущий: {contact.phone}): ")
+    email = ask(email, f"Введите новый email (текущий: {contact.email}): ")
+    contact.name = name
+    contact.phone = phone
+    contact.email = email
+    try:
+        CONTACTS.update(contact)
+    except ConflictError as e:
+        print(e)
+        return
+    print("Контакт успешно обновлен.")
 
-def delete_contact():
-    contact_id = input("Введите ID контакта для удаления: ")
-    contacts = load_contacts()
-    contacts = [contact for contact in contacts if str(contact.id) != contact_id]
-    save_contacts(contacts)
+@instrumented
+def delete_contact(contact_id=None):
+    contact_id = ask(contact_id, "Введите ID контакта для удаления: ")
+    if not CONTACTS.remove(parse_id(contact_id)):
+        print("Контакт не найден.")
+        return
     print("Контакт успешно удален.")
 
-def import_contacts_csv():
-    filename = input("Введите имя CSV-файла для импорта: ")
-    try:
-        with open(filename, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            contacts = load_contacts()
-            for row in reader:
-                contact = Contact(
-                    id=int(row['id']),
-                    name=row['name'],
-                    phone=row['phone'],
-                    email=row['email']
-                )
-                contacts.append(contact)
-            save_contacts(contacts)
-            print("Импорт завершен успешно.")
-    except Exception as e:
-        print(f"Ошибка при импорте: {e}")
+def contact_from_row(row):
+    return Contact(
+        id=parse_id(row.get('id') or ''),
+        name=row['name'],
+        phone=row['phone'],
+        email=row['email']
+    )
 
-def export_contacts_csv():
-    filename = input("Введите имя CSV-файла для экспорта: ")
-    contacts = load_contacts()
-    if not contacts:
+@instrumented
+def import_contacts_csv(filename=None):
+    import_csv(CONTACTS, contact_from_row, filename)
+
+@instrumented
+def export_contacts_csv(filename=None):
+    if not CONTACTS.count():
         print("Нет контактов для экспорта.")
         return
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['id', 'name', 'phone', 'email']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for contact in contacts:
-            writer.writerow(contact.to_dict())
-    print("Экспорт завершен успешно.")
+    conditions = []
+    export_records(CONTACTS, ['id', 'name', 'phone', 'email'], conditions, filename)
 
 def finance_menu():
     while True:
@@ -599,8 +3106,9 @@ def finance_menu():
         print("3. Генерация отчёта")
         print("4. Подсчёт общего баланса")
         print("5. Импорт финансовых записей из CSV")
-        print("6. Экспорт финансовых записей в CSV")
-        print("7. Назад в главное меню")
+        print("6. Экспорт финансовых записей (CSV/JSONL)")
+        print("7. Аналитика за период")
+        print("8. Назад в главное меню")
 
         choice = input("Выберите действие: ")
         if choice == '1':
@@ -616,125 +3124,789 @@ def finance_menu():
         elif choice == '6':
             export_finance_csv()
         elif choice == '7':
+            finance_analytics()
+        elif choice == '8':
             break
         else:
-            print("Неверный ввод. Введите целое число от 1 до 7")
+            print("Неверный ввод. Введите целое число от 1 до 8")
 
+@instrumented
 def load_finance_records():
-    if not os.path.exists(FINANCE_FILE):
-        return []
-    with open(FINANCE_FILE, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-        return [FinanceRecord.from_dict(record) for record in data]
+    return FINANCE.all()
 
+@instrumented
 def save_finance_records(records):
-    with open(FINANCE_FILE, 'w', encoding='utf-8') as file:
-        json.dump([record.to_dict() for record in records], file, ensure_ascii=False, indent=4)
+    FINANCE.replace_all(records)
 
-def create_finance_record():
-    records = load_finance_records()
-    record_id = max([record.id for record in records], default=0) + 1
-    amount = input("Введите сумму операции (положительное число для дохода, отрицательное для расхода): ")
+@instrumented
+def create_finance_record(amount=None, category=None, record_date=None, description=None):
+    amount = ask(amount, "Введите сумму операции (положительное число для дохода, отрицательное для расхода): ")
     try:
         amount = float(amount)
     except ValueError:
         print("Некорректная сумма.")
         return
-    category = input("Введите категорию операции: ")
-    date = input("Введите дату операции (ДД-ММ-ГГГГ): ")
+    category = ask(category, "Введите категорию операции: ")
+    date = ask(record_date, "Введите дату операции (ДД-ММ-ГГГГ): ")
     try:
-        datetime.strptime(date, '%d-%m-%Y')
+        date = require_date(date)
     except ValueError:
         print("Некорректный формат даты. Используйте ДД-ММ-ГГГГ.")
         return
-    description = input("Введите описание операции: ")
-    record = FinanceRecord(id=record_id, amount=amount, category=category, date=date, description=description)
-    records.append(record)
-    save_finance_records(records)
+    description = ask(description, "Введите описание операции: ")
+    record = FinanceRecord(id=FINANCE.allocate_id(), amount=amount, category=category, date=date, description=description)
+    FINANCE.add(record)
     print("Финансовая запись успешно добавлена.")
 
-def list_finance_records():
-    records = load_finance_records()
-    if not records:
-        print("Список финансовых записей пуст.")
-        return
-    print("\nСписок финансовых записей:")
-    for record in records:
-        print(f"ID: {record.id}, Сумма: {record.amount}, Категория: {record.category}, Дата: {record.date}, Описание: {record.description}")
+def print_finance_record(record):
+    print(f"ID: {record.id}, Сумма: {record.amount}, Категория: {record.category}, Дата: {display_date(record.date)}, Описание: {record.description}")
 
-def generate_finance_report():
-    start_date = input("Введите начальную дату периода (ДД-ММ-ГГГГ): ")
-    end_date = input("Введите конечную дату периода (ДД-ММ-ГГГГ): ")
-    try:
-        start = datetime.strptime(start_date, '%d-%m-%Y')
-        end = datetime.strptime(end_date, '%d-%m-%Y')
-    except ValueError:
+@instrumented
+def list_finance_records(cursor=None, page_size=PAGE_SIZE, newest_first=True, interactive=True):
+    browse(FINANCE, "Список финансовых записей", "Список финансовых записей пуст.", print_finance_record, cursor, page_size, newest_first, interactive)
+
+@instrumented
+def generate_finance_report(start_date=None, end_date=None):
+    start_date = ask(start_date, "Введите начальную дату периода (ДД-ММ-ГГГГ): ")
+    end_date = ask(end_date, "Введите конечную дату периода (ДД-ММ-ГГГГ): ")
+    start_key, end_key = date_key(start_date), date_key(end_date)
+    if start_key is None or end_key is None:
         print("Некорректный формат даты. Используйте ДД-ММ-ГГГГ.")
         return
-    records = load_finance_records()
-    filtered_records = [record for record in records if start <= datetime.strptime(record.date, '%d-%m-%Y') <= end]
-    if not filtered_records:
+    total_income, total_expense, count = FINANCE.period_totals(start_key, end_key)
+    if not count:
         print("Нет записей за указанный период.")
         return
-    total_income = sum(record.amount for record in filtered_records if record.amount > 0)
-    total_expense = sum(record.amount for record in filtered_records if record.amount < 0)
     print(f"\nОтчет с {start_date} по {end_date}:")
     print(f"Общий доход: {total_income}")
     print(f"Общий расход: {total_expense}")
     print(f"Баланс: {total_income + total_expense}")
 
+@instrumented
 def calculate_balance():
-    records = load_finance_records()
-    balance = sum(record.amount for record in records)
-    print(f"Текущий общий баланс: {balance}")
+    print(f"Текущий общий баланс: {FINANCE.balance()}")
+    categories = FINANCE.category_totals()
+    if categories:
+        print("По категориям:")
+        for category, (income, expense, count) in sorted(categories.items()):
+            print(f"{category}: доход {income}, расход {expense}, операций {count}")
 
-def import_finance_csv():
-    filename = input("Введите имя CSV-файла для импорта: ")
-    try:
-        with open(filename, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            records = load_finance_records()
-            for row in reader:
-                record = FinanceRecord(
-                    id=int(row['id']),
-                    amount=float(row['amount']),
-                    category=row['category'],
-                    date=row['date'],
-                    description=row['description']
-                )
-                records.append(record)
-            save_finance_records(records)
-            print("Импорт завершен успешно.")
-    except Exception as e:
-        print(f"Ошибка при импорте: {e}")
+@instrumented
+def finance_analytics(start_date=None, end_date=None):
+    start_date = ask(start_date, "Введите начальную дату периода (ДД-ММ-ГГГГ): ")
+    end_date = ask(end_date, "Введите конечную дату периода (ДД-ММ-ГГГГ): ")
+    start_key, end_key = date_key(start_date), date_key(end_date)
+    if start_key is None or end_key is None:
+        print("Некорректный формат даты. Используйте ДД-ММ-ГГГГ.")
+        return
+    categories = FINANCE.category_report(start_key, end_key)
+    if not categories:
+        print("Нет записей за указанный период.")
+        return
+    print(f"\nКатегории с {start_date} по {end_date}:")
+    for category, (income, expense, count) in sorted(categories.items(), key=lambda item: item[1][1]):
+        print(f"{category}: доход {income}, расход {expense}, операций {count}")
+    print("\nПомесячная динамика:")
+    for month, income, expense, closing in FINANCE.monthly_trend(start_key, end_key):
+        print(f"{format_month(month)}: доход {income}, расход {expense}, баланс на конец месяца {closing}")
+    series = FINANCE.running_balance(start_key, end_key)
+    low_day, low_balance = min(series, key=lambda point: point[1])
+    high_day, high_balance = max(series, key=lambda point: point[1])
+    print(f"\nМинимальный баланс: {low_balance} ({display_date(date.fromordinal(low_day).isoformat())})")
+    print(f"Максимальный баланс: {high_balance} ({display_date(date.fromordinal(high_day).isoformat())})")
+
+def finance_record_from_row(row):
+    return FinanceRecord(
+        id=parse_id(row.get('id') or ''),
+        amount=float(row['amount']),
+        category=row['category'],
+        date=require_date(row['date']),
+        description=row['description']
+    )
 
-def export_finance_csv():
-    filename = input("Введите имя CSV-файла для экспорта: ")
-    records = load_finance_records()
-    if not records:
+@instrumented
+def import_finance_csv(filename=None):
+    import_csv(FINANCE, finance_record_from_row, filename)
+
+@instrumented
+def export_finance_csv(filename=None, start=None, end=None, category=None):
+    if not FINANCE.count():
         print("Нет финансовых записей для экспорта.")
         return
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['id', 'amount', 'category', 'date', 'description']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for record in records:
-            writer.writerow(record.to_dict())
-    print("Экспорт завершен успешно.")
+    try:
+        conditions = date_conditions(lambda record: record.date, 'date_key', *read_date_range(start, end))
+    except ValueError as e:
+        print(e)
+        return
+    category = ask(category, "Введите категорию или оставьте пустой: ").strip()
+    if category:
+        conditions.append((lambda record: record.category == category, 'category = ?', (category,)))
+    export_records(FINANCE, ['id', 'amount', 'category', 'date', 'description'], conditions, filename)
+
+class CalculatorError(ValueError):
+    pass
+
+CALC_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+CALC_UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+CALC_FUNCTIONS = {'abs': abs, 'round': round, 'min': min, 'max': max, 'sqrt': math.sqrt}
+CALC_CONSTANTS = {'pi': math.pi, 'e': math.e}
+
+def check_number(value):
+    if isinstance(value, complex):
+        raise CalculatorError("Результат не является действительным числом.")
+    if isinstance(value, int) and value.bit_length() > CALC_MAX_BITS:
+        raise CalculatorError("Слишком большое число.")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise CalculatorError("Переполнение.")
+    return value
+
+def check_operands(operation, left, right):
+    if operation is operator.pow:
+        if abs(right) > CALC_MAX_EXPONENT:
+            raise CalculatorError(f"Показатель степени больше {CALC_MAX_EXPONENT}.")
+        if isinstance(left, int) and isinstance(right, int) and right > 0 and left.bit_length() * right > CALC_MAX_BITS:
+            raise CalculatorError("Слишком большое число.")
+    elif operation is operator.mul and isinstance(left, int) and isinstance(right, int):
+        if left.bit_length() + right.bit_length() > CALC_MAX_BITS:
+            raise CalculatorError("Слишком большое число.")
+
+def check_arguments(function, values):
+    if function is round and len(values) > 1 and isinstance(values[1], (int, float)) and abs(values[1]) > CALC_MAX_EXPONENT:
+        raise CalculatorError(f"Число знаков округления больше {CALC_MAX_EXPONENT}.")
+
+def compile_node(node):
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = check_number(node.value)
+        return lambda calculator, deadline: value
+    if isinstance(node, ast.Name):
+        name = node.id
+        return lambda calculator, deadline: calculator.lookup(name)
+    if isinstance(node, ast.BinOp) and type(node.op) in CALC_BINARY_OPERATORS:
+        operation = CALC_BINARY_OPERATORS[type(node.op)]
+        left, right = compile_node(node.left), compile_node(node.right)
 
-def calculator():
+        def binary(calculator, deadline):
+            a, b = left(calculator, deadline), right(calculator, deadline)
+            if time.perf_counter() > deadline:
+                raise CalculatorError("Превышено время вычисления.")
+            check_operands(operation, a, b)
+            return check_number(operation(a, b))
+        return binary
+    if isinstance(node, ast.UnaryOp) and type(node.op) in CALC_UNARY_OPERATORS:
+        operation = CALC_UNARY_OPERATORS[type(node.op)]
+        operand = compile_node(node.operand)
+        return lambda calculator, deadline: operation(operand(calculator, deadline))
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        name = node.func.id
+        if name == 'balance':
+            if not node.args:
+                return lambda calculator, deadline: calculator.balance()
+            if len(node.args) == 1 and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+                category = node.args[0].value
+                return lambda calculator, deadline: calculator.balance(category)
+            raise CalculatorError("balance() принимает только название категории в кавычках.")
+        if name in CALC_FUNCTIONS:
+            function = CALC_FUNCTIONS[name]
+            args = [compile_node(arg) for arg in node.args]
+
+            def call(calculator, deadline):
+                values = [arg(calculator, deadline) for arg in args]
+                if time.perf_counter() > deadline:
+                    raise CalculatorError("Превышено время вычисления.")
+                check_arguments(function, values)
+                return check_number(function(*values))
+            return call
+        raise CalculatorError(f"Неизвестная функция: {name}")
+    raise CalculatorError(f"Недопустимая конструкция: {type(node).__name__}")
+
+@functools.lru_cache(maxsize=CALC_CACHE_SIZE)
+def compile_expression(expression):
+    if len(expression) > CALC_MAX_LENGTH:
+        raise CalculatorError(f"Выражение длиннее {CALC_MAX_LENGTH} символов.")
+    try:
+        tree = ast.parse(expression, mode='exec')
+    except (SyntaxError, RecursionError, MemoryError):
+        raise CalculatorError("Синтаксическая ошибка.")
+    if len(tree.body) != 1:
+        raise CalculatorError("Ожидается одно выражение.")
+    if sum(1 for _ in ast.walk(tree)) > CALC_MAX_NODES:
+        raise CalculatorError("Слишком сложное выражение.")
+    statement = tree.body[0]
+    if isinstance(statement, ast.Expr):
+        return None, compile_node(statement.value)
+    if isinstance(statement, ast.Assign) and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name):
+        target = statement.targets[0].id
+        if target in CALC_FUNCTIONS or target in CALC_CONSTANTS or target == 'balance':
+            raise CalculatorError(f"Имя {target} зарезервировано.")
+        return target, compile_node(statement.value)
+    raise CalculatorError("Допустимы только выражение или присваивание вида x = выражение.")
+
+class Calculator:
+    def __init__(self, finance):
+        self.finance = finance
+        self.variables = {}
+
+    def lookup(self, name):
+        if name in self.variables:
+            return self.variables[name]
+        if name in CALC_CONSTANTS:
+            return CALC_CONSTANTS[name]
+        if name == 'balance':
+            return self.balance()
+        raise CalculatorError(f"Неизвестная переменная: {name}")
+
+    def balance(self, category=None):
+        if category is None:
+            return self.finance.balance()
+        totals = self.finance.category_totals()
+        if category not in totals:
+            raise CalculatorError(f"Нет категории: {category}")
+        income, expense, count = totals[category]
+        return income + expense
+
+    def evaluate(self, expression):
+        target, evaluate = compile_expression(expression.strip())
+        result = evaluate(self, time.perf_counter() + CALC_TIME_LIMIT)
+        self.variables['_'] = result
+        if target is not None:
+            self.variables[target] = result
+        return result
+
+CALCULATOR = Calculator(FINANCE)
+
+@instrumented
+def calculator(expression=None):
     print("\nКалькулятор")
-    expression = input("Введите выражение (например, 2 + 2): ")
+    expression = ask(expression, "Введите выражение (например, 2 + 2, x = balance / 12): ")
     try:
-        allowed_chars = set('0123456789+-*/(). ')
-        if not set(expression).issubset(allowed_chars):
-            raise ValueError("Использованы недопустимые символы.")
-        result = eval(expression, {'__builtins__': None}, {})
-        print(f"Результат: {result}")
+        print(f"Результат: {CALCULATOR.evaluate(expression)}")
     except ZeroDivisionError:
         print("Ошибка: Деление на ноль.")
-    except Exception as e:
+    except (CalculatorError, ArithmeticError, TypeError, ValueError) as e:
         print(f"Ошибка в выражении: {e}")
 
+@instrumented
+def calculate_file(filename):
+    try:
+        file = sys.stdin if filename == '-' else open(filename, 'r', encoding='utf-8')
+    except OSError as e:
+        print(f"Ошибка при чтении файла: {e}")
+        return
+    errors = 0
+    for number, line in enumerate(file, 1):
+        expression = line.split('#', 1)[0].strip()
+        if not expression:
+            continue
+        try:
+            print(f"{expression} = {CALCULATOR.evaluate(expression)}")
+        except ZeroDivisionError:
+            errors += 1
+            print(f"Строка {number}: деление на ноль.")
+        except (CalculatorError, ArithmeticError, TypeError, ValueError) as e:
+            errors += 1
+            print(f"Строка {number}: {e}")
+    if file is not sys.stdin:
+        file.close()
+    if errors:
+        print(f"Ошибок: {errors}")
+
+class ReadWriteLock:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self.condition:
+            while self.writer or self.waiting_writers:
+                self.condition.wait()
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.readers -= 1
+                if not self.readers:
+                    self.condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self.condition:
+            self.waiting_writers += 1
+            while self.writer or self.readers:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writer = True
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.writer = False
+                self.condition.notify_all()
+
+API_ENTITIES = {
+    'notes': (NOTES, Note, {'title': '', 'content': ''}),
+    'tasks': (TASKS, Task, {'title': '', 'description': '', 'done': False, 'priority': 'Средний', 'due_date': None}),
+    'contacts': (CONTACTS, Contact, {'name': '', 'phone': '', 'email': ''}),
+    'finance': (FINANCE, FinanceRecord, {'amount': None, 'category': '', 'date': None, 'description': ''}),
+}
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def api_record(section, data, record_id):
+    repository, record_class, defaults = API_ENTITIES[section]
+    data = dict(data, id=record_id)
+    for field in defaults:
+        if field == 'done':
+            if not isinstance(data[field], bool):
+                raise ValueError(f"поле {field} должно быть true или false")
+        elif field == 'amount':
+            if isinstance(data[field], bool) or not isinstance(data[field], (int, float, str)):
+                raise ValueError("некорректная сумма")
+        elif not isinstance(data[field], str):
+            raise ValueError(f"поле {field} должно быть строкой")
+    for field in ('title', 'name'):
+        if field in defaults and not data[field].strip():
+            raise ValueError(f"поле {field} не может быть пустым")
+    if section == 'notes':
+        data['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    elif section == 'tasks':
+        if data['priority'] not in PRIORITY_RANKS:
+            raise ValueError("некорректный приоритет")
+        data['due_date'] = require_date(data['due_date'])
+    elif section == 'finance':
+        try:
+            data['amount'] = float(data['amount'])
+        except (TypeError, ValueError):
+            raise ValueError("некорректная сумма")
+        data['date'] = require_date(data['date'])
+    return record_class.from_dict(data)
+
+class ApiServer:
+    def __init__(self):
+        self.lock = ReadWriteLock()
+
+    def load(self):
+        with self.lock.write():
+            self.refresh()
+
+    def refresh(self):
+        for repository, record_class, defaults in API_ENTITIES.values():
+            repository.pinned = False
+            repository.warm_indexes()
+            repository.pinned = True
+
+    def stale(self):
+        return any(repository.stale() for repository, record_class, defaults in API_ENTITIES.values())
+
+    def handle(self, method, path, params, body):
+        parts = [part for part in path.split('/') if part]
+        if not parts or parts[0] not in API_ENTITIES or len(parts) > 2:
+            raise ApiError(404, "неизвестный путь")
+        section = parts[0]
+        target = parts[1] if len(parts) == 2 else None
+        if method == 'GET':
+            while True:
+                with self.lock.read():
+                    if not self.stale():
+                        return self.read(section, target, params)
+                with self.lock.write():
+                    self.refresh()
+        with self.lock.write():
+            for repository, record_class, defaults in API_ENTITIES.values():
+                repository.pinned = False
+            try:
+                return self.write(method, section, target, body)
+            finally:
+                self.refresh()
+
+    def read(self, section, target, params):
+        repository = API_ENTITIES[section][0]
+        if target is None:
+            return self.list(section, params)
+        if section == 'tasks' and target == 'overdue':
+            return [task.to_dict() for task in TASKS.overdue(date.today().toordinal())]
+        if section == 'finance' and target == 'report':
+            start_key, end_key = read_date_range(params.get('from', ''), params.get('to', ''))
+            income, expense, count = FINANCE.period_totals(start_key or date.min.toordinal(), end_key or date.max.toordinal())
+            return {'income': income, 'expense': expense, 'balance': income + expense, 'count': count}
+        if section == 'finance' and target == 'balance':
+            categories = FINANCE.category_totals()
+            return {
+                'balance': FINANCE.balance(),
+                'categories': {category: {'income': income, 'expense': expense, 'count': count} for category, (income, expense, count) in categories.items()}
+            }
+        record = repository.get(parse_id(target))
+        if record is None:
+            raise ApiError(404, "запись не найдена")
+        return record.to_dict()
+
+    def list(self, section, params):
+        query = params.get('q', '').strip()
+        if section == 'notes' and query:
+            return [dict(note.to_dict(), score=score) for note, score in NOTES.search(query)]
+        if section == 'contacts' and query:
+            return [contact.to_dict() for contact in CONTACTS.search(query)]
+        if section == 'tasks':
+            status = params.get('status', '')
+            limit = params.get('limit', '')
+            offset = params.get('offset', '')
+            if not (limit.isdigit() or not limit) or not (offset.isdigit() or not offset):
+                raise ValueError("некорректное число")
+            due_from, due_to = read_date_range(params.get('from', ''), params.get('to', ''))
+            tasks = TASKS.query(
+                done=None if not status else status == 'Выполнена',
+                priority=params.get('priority') or None,
+                due_from=due_from,
+                due_to=due_to,
+                text=params.get('text', ''),
+                order_by=parse_task_order(params.get('order', '')),
+                limit=int(limit) if limit else None,
+                offset=int(offset or 0)
+            )
+            return [task.to_dict() for task in tasks]
+        if section == 'finance':
+            conditions = date_conditions(lambda record: record.date, None, *read_date_range(params.get('from', ''), params.get('to', '')))
+            return [record.to_dict() for record in FINANCE.all() if all(condition(record) for condition, where, values in conditions)]
+        return [record.to_dict() for record in API_ENTITIES[section][0].all()]
+
+    def write(self, method, section, target, body):
+        repository, record_class, defaults = API_ENTITIES[section]
+        if method != 'DELETE' and not isinstance(body, dict):
+            raise ValueError("ожидается JSON-объект")
+        fields = {name: body[name] for name in defaults if name in (body or {})}
+        if method == 'POST' and target is None:
+            record = api_record(section, dict(defaults, **fields), repository.allocate_id())
+            repository.add(record)
+            return record.to_dict()
+        record_id = parse_id(target or '')
+        current = repository.checkout(record_id)
+        if current is None:
+            raise ApiError(404, "запись не найдена")
+        if method == 'PUT':
+            record = api_record(section, dict(current.to_dict(), **fields), record_id)
+            repository.update(record)
+            return record.to_dict()
+        if method == 'DELETE':
+            repository.remove(record_id)
+            return {'deleted': record_id}
+        raise ApiError(405, "метод не поддерживается")
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    api = None
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            body = None
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                body = json.loads(self.rfile.read(length).decode('utf-8'))
+            self.respond(200, self.api.handle(method, url.path, params, body))
+        except ApiError as e:
+            self.respond(e.status, {'error': str(e)})
+        except ConflictError as e:
+            self.respond(409, {'error': str(e)})
+        except ValueError as e:
+            self.respond(400, {'error': str(e)})
+        except Exception:
+            traceback.print_exc()
+            self.respond(500, {'error': "внутренняя ошибка сервера"})
+
+    def respond(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port=SERVER_PORT):
+    api = ApiServer()
+    api.load()
+    ApiRequestHandler.api = api
+    server = ThreadingHTTPServer((SERVER_HOST, port), ApiRequestHandler)
+    print(f"Сервер запущен на http://{SERVER_HOST}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Сервер остановлен.")
+    finally:
+        server.server_close()
+
+def edit_values(repository, args, fields):
+    record = repository.get(parse_id(args.id))
+    values = [getattr(args, field) for field in fields]
+    if record is None:
+        return ['' if value is None else value for value in values]
+    return [getattr(record, field) if value is None else value for field, value in zip(fields, values)]
+
+def schedule_args(args):
+    if args.overdue:
+        return '1', None
+    if args.today:
+        return '2', None
+    if args.days is not None:
+        return '3', args.days
+    if args.urgent is not None:
+        return '4', args.urgent
+    return None
+
+def page_size(value):
+    if not value.isdigit():
+        raise argparse.ArgumentTypeError("ожидается неотрицательное целое число")
+    return int(value)
+
+def page_args(command):
+    command.add_argument('--cursor', type=int, help="ID, после которого начинается страница")
+    command.add_argument('--page-size', dest='page_size', type=page_size, default=PAGE_SIZE, help="записей на странице, 0 — все")
+    command.add_argument('--oldest-first', dest='newest_first', action='store_false', help="сначала старые записи")
+    return command
+
+@instrumented
+def list_tasks_command(args):
+    choice = schedule_args(args)
+    if choice is None:
+        list_tasks(args.cursor, args.page_size, args.newest_first, False)
+    else:
+        task_schedule(*choice)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='personal_assistant', description="Персональный помощник")
+    parser.add_argument('--profile', nargs='?', const='1', help="замерить время операций; путь .json — сохранить сводку в файл")
+    parser.add_argument('--profile-op', dest='profile_op', help="снять cProfile и tracemalloc для одной операции, например list_notes")
+    sections = parser.add_subparsers(dest='section')
+
+    notes = sections.add_parser('notes', help="заметки").add_subparsers(dest='command', required=True)
+    command = notes.add_parser('add')
+    command.add_argument('--title', required=True)
+    command.add_argument('--content', default='')
+    command.set_defaults(handler=lambda args: create_note(args.title, args.content))
+    page_args(notes.add_parser('list')).set_defaults(handler=lambda args: list_notes(args.cursor, args.page_size, args.newest_first, False))
+    command = notes.add_parser('view')
+    command.add_argument('id')
+    command.set_defaults(handler=lambda args: view_note(args.id))
+    command = notes.add_parser('edit')
+    command.add_argument('id')
+    command.add_argument('--title')
+    command.add_argument('--content')
+    command.set_defaults(handler=lambda args: edit_note(args.id, *edit_values(NOTES, args, ['title', 'content'])))
+    command = notes.add_parser('delete')
+    command.add_argument('id')
+    command.set_defaults(handler=lambda args: delete_note(args.id))
+    command = notes.add_parser('search')
+    command.add_argument('query')
+    command.set_defaults(handler=lambda args: search_notes(args.query))
+    command = notes.add_parser('import')
+    command.add_argument('file')
+    command.set_defaults(handler=lambda args: import_notes_csv(args.file))
+    command = notes.add_parser('export')
+    command.add_argument('file')
+    command.add_argument('--from', dest='start', default='')
+    command.add_argument('--to', dest='end', default='')
+    command.set_defaults(handler=lambda args: export_notes_csv(args.file, args.start, args.end))
+
+    tasks = sections.add_parser('tasks', help="задачи").add_subparsers(dest='command', required=True)
+    command = tasks.add_parser('add')
+    command.add_argument('--title', required=True)
+    command.add_argument('--description', default='')
+    command.add_argument('--priority', default='Средний')
+    command.add_argument('--due', required=True)
+    command.set_defaults(handler=lambda args: create_task(args.title, args.description, args.priority, args.due))
+    command = page_args(tasks.add_parser('list'))
+    group = command.add_mutually_exclusive_group()
+    group.add_argument('--overdue', action='store_true')
+    group.add_argument('--today', action='store_true')
+    group.add_argument('--days', type=int)
+    group.add_argument('--urgent', type=int)
+    command.set_defaults(handler=list_tasks_command)
+    command = tasks.add_parser('done')
+    command.add_argument('id')
+    command.set_defaults(handler=lambda args: mark_task_done(args.id))
+    command = tasks.add_parser('edit')
+    command.add_argument('id')
+    command.add_argument('--title')
+    command.add_argument('--description')
+    command.add_argument('--priority')
+    command.add_argument('--due', dest='due_date')
+    command.set_defaults(handler=lambda args: edit_task(args.id, *edit_values(TASKS, args, ['title', 'description', 'priority', 'due_date'])))
+    command = tasks.add_parser('delete')
+    command.add_argument('id')
+    command.set_defaults(handler=lambda args: delete_task(args.id))
+    command = tasks.add_parser('filter')
+    command.add_argument('--status', default='')
+    command.add_argument('--priority', default='')
+    command.add_argument('--from', dest='start', default='')
+    command.add_argument('--to', dest='end', default='')
+    command.add_argument('--text', default='')
+    command.add_argument('--order', default='', help="поля через запятую, например 'приоритет:убыв,срок'")
+    command.add_argument('--limit', default='')
+    command.add_argument('--offset', default='')
+    command.set_defaults(handler=lambda args: filter_tasks(args.status, args.priority, args.start, args.end, args.text, args.order, args.limit, args.offset))
+    command = tasks.add_parser('import')
+    command.add_argument('file')
+    command.set_defaults(handler=lambda args: import_tasks_csv(args.file))
+    command = tasks.add_parser('export')
+    command.add_argument('file')
+    command.add_argument('--from', dest='start', default='')
+    command.add_argument('--to', dest='end', default='')
+    command.add_argument('--status', default='')
+    command.set_defaults(handler=lambda args: export_tasks_csv(args.file, args.start, args.end, args.status))
+
+    contacts = sections.add_parser('contacts', help="контакты").add_subparsers(dest='command', required=True)
+    command = contacts.add_parser('add')
+    command.add_argument('--name', required=True)
+    command.add_argument('--phone', default='')
+    command.add_argument('--email', default='')
+    command.set_defaults(handler=lambda args: create_contact(args.name, args.phone, args.email))
+    command = contacts.add_parser('search')
+    command.add_argument('query')
+    command.set_defaults(handler=lambda args: search_contact(args.query))
+    command = contacts.add_parser('edit')
+    command.add_argument('id')
+    command.add_argument('--name')
+    command.add_argument('--phone')
+    command.add_argument('--email')
+    command.set_defaults(handler=lambda args: edit_contact(args.id, *edit_values(CONTACTS, args, ['name', 'phone', 'email'])))
+    command = contacts.add_parser('delete')
+    command.add_argument('id')
+    command.set_defaults(handler=lambda args: delete_contact(args.id))
+    command = contacts.add_parser('import')
+    command.add_argument('file')
+    command.set_defaults(handler=lambda args: import_contacts_csv(args.file))
+    command = contacts.add_parser('export')
+    command.add_argument('file')
+    command.set_defaults(handler=lambda args: export_contacts_csv(args.file))
+
+    finance = sections.add_parser('finance', help="финансы").add_subparsers(dest='command', required=True)
+    command = finance.add_parser('add')
+    command.add_argument('--amount', required=True)
+    command.add_argument('--category', default='')
+    command.add_argument('--date', default=date.today().isoformat())
+    command.add_argument('--description', default='')
+    command.set_defaults(handler=lambda args: create_finance_record(args.amount, args.category, args.date, args.description))
+    page_args(finance.add_parser('list')).set_defaults(handler=lambda args: list_finance_records(args.cursor, args.page_size, args.newest_first, False))
+    finance.add_parser('balance').set_defaults(handler=lambda args: calculate_balance())
+    command = finance.add_parser('report')
+    command.add_argument('--from', dest='start', required=True)
+    command.add_argument('--to', dest='end', required=True)
+    command.set_defaults(handler=lambda args: generate_finance_report(args.start, args.end))
+    command = finance.add_parser('analytics')
+    command.add_argument('--from', dest='start', required=True)
+    command.add_argument('--to', dest='end', required=True)
+    command.set_defaults(handler=lambda args: finance_analytics(args.start, args.end))
+    command = finance.add_parser('import')
+    command.add_argument('file')
+    command.set_defaults(handler=lambda args: import_finance_csv(args.file))
+    command = finance.add_parser('export')
+    command.add_argument('file')
+    command.add_argument('--from', dest='start', default='')
+    command.add_argument('--to', dest='end', default='')
+    command.add_argument('--category', default='')
+    command.set_defaults(handler=lambda args: export_finance_csv(args.file, args.start, args.end, args.category))
+
+    command = sections.add_parser('calc', help="калькулятор")
+    command.add_argument('expression', nargs='*')
+    command.add_argument('--file', help="вычислить выражения построчно из файла ('-' — stdin)")
+    command.set_defaults(handler=lambda args: calculate_file(args.file) if args.file else calculator(' '.join(args.expression) or None))
+
+    command = sections.add_parser('serve', help="запустить HTTP/JSON API на localhost")
+    command.add_argument('--port', type=int, default=SERVER_PORT)
+    command.set_defaults(handler=lambda args: serve(args.port))
+
+    command = sections.add_parser('convert', help="перезаписать файлы данных в другом формате")
+    command.add_argument('format', choices=STORAGE_FORMATS)
+    command.set_defaults(handler=lambda args: convert_storage(args.format))
+
+    command = sections.add_parser('memory', help="сравнить расход памяти и скорость представлений записей")
+    command.add_argument('--count', type=int, default=1000000)
+    command.set_defaults(handler=lambda args: measure_records(args.count))
+
+    sections.add_parser('formats', help="сравнить скорость и размер форматов").set_defaults(handler=lambda args: measure_formats())
+
+    command = sections.add_parser('sync', help="синхронизировать с другой папкой данных")
+    command.add_argument('directory')
+    command.add_argument('--dry-run', dest='dry_run', action='store_true', help="только показать, что изменится")
+    command.set_defaults(handler=lambda args: sync_directories(args.directory, args.dry_run))
+
+    command = sections.add_parser('dedupe', help="найти и объединить дубликаты")
+    command.add_argument('entity', nargs='?', choices=list(DEDUPE_SECTIONS))
+    command.add_argument('--dry-run', dest='dry_run', action='store_true', help="только показать найденные дубликаты")
+    command.add_argument('--force', action='store_true', help="объединять и финансовые записи")
+    command.set_defaults(handler=lambda args: merge_duplicates(args.entity, args.dry_run, args.force))
+
+    command = sections.add_parser('batch', help="выполнить команды из файла или stdin")
+    command.add_argument('file', nargs='?', default='-')
+    command.set_defaults(handler=lambda args: run_batch(args.file))
+    return parser
+
+def run_command(argv):
+    args = build_parser().parse_args(argv)
+    if args.profile or args.profile_op:
+        INSTRUMENTATION.enable(args.profile_op, args.profile if args.profile and args.profile.endswith('.json') else None)
+    if args.section is None:
+        main_menu()
+    else:
+        args.handler(args)
+
+def run_batch(filename):
+    try:
+        file = sys.stdin if filename == '-' else open(filename, 'r', encoding='utf-8')
+    except OSError as e:
+        print(f"Ошибка при чтении файла: {e}")
+        return
+    with batch_writes():
+        for number, line in enumerate(file, 1):
+            try:
+                argv = shlex.split(line, comments=True)
+            except ValueError as e:
+                print(f"Строка {number}: {e}")
+                continue
+            if not argv:
+                continue
+            if argv[0] == 'batch':
+                print(f"Строка {number}: вложенный batch не поддерживается.")
+                continue
+            try:
+                run_command(argv)
+            except SystemExit:
+                print(f"Строка {number}: некорректная команда.")
+    if file is not sys.stdin:
+        file.close()
+
 if __name__ == "__main__":
-    main_menu()
\ No newline at end of file
+    migrate_legacy_files()
+    migrate_dates()
+    if len(sys.argv) > 1:
+        run_command(sys.argv[1:])
+    else:
+        main_menu()
\ No newline at end of file